@@ -0,0 +1,145 @@
+import itertools
+import numpy as np
+import pandas as pd
+from screener import panel_rsi
+
+# Bars per year, for annualizing returns and turnover
+TRADING_DAYS = 252
+# Upper bound on combos x dates x symbols evaluated at once, to cap memory
+GRID_CHUNK_ELEMENTS = 2_000_000
+
+METRIC_COLUMNS = ['total_return', 'annual_return', 'max_drawdown', 'hit_rate', 'trades', 'turnover', 'exposure']
+
+def _cached(cache, key, compute):
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+# Signal functions get indicator parameters as scalars, threshold parameters as
+# (combos,) arrays and a dict for sharing work between calls, and return entry/exit
+# masks shaped (combos or 1, dates, symbols)
+
+def _rsi_signals(close, cache, period, lower, upper):
+    """Go long when RSI drops below ``lower`` and flat once it rises above ``upper``"""
+    rsi = _cached(cache, ('rsi', int(period)), lambda: panel_rsi(close, int(period)).to_numpy()[None])
+    return rsi < lower[:, None, None], rsi > upper[:, None, None]
+
+def _macd_signals(close, cache, fast, slow, signal):
+    """Long while MACD is above its signal line"""
+    def ema(span):
+        return _cached(cache, ('ema', span), lambda: close.ewm(span=span, adjust=False).mean())
+    macd = _cached(cache, ('macd', fast, slow), lambda: ema(fast) - ema(slow))
+    above = (macd > macd.ewm(span=signal, adjust=False).mean()).to_numpy()[None]
+    return above, ~above
+
+def _bollinger_signals(close, cache, window, k):
+    """Go long below the lower band (``k`` standard deviations) and flat above the middle band"""
+    def bands():
+        rolling = close.rolling(window=int(window))
+        return rolling.mean().to_numpy(), rolling.std().to_numpy()
+    middle, std = _cached(cache, ('bollinger', int(window)), bands)
+    prices = _cached(cache, 'prices', close.to_numpy)
+    return prices[None] < middle[None] - k[:, None, None] * std[None], (prices > middle)[None]
+
+# Signal rules: their parameters, which of them change the indicator itself (computed once
+# per distinct value), and the function turning them into entry/exit masks
+STRATEGIES = {
+    'rsi': {'params': ('period', 'lower', 'upper'), 'indicator': ('period',), 'signals': _rsi_signals},
+    'macd': {'params': ('fast', 'slow', 'signal'), 'indicator': ('fast', 'slow', 'signal'), 'signals': _macd_signals},
+    'bollinger': {'params': ('window', 'k'), 'indicator': ('window',), 'signals': _bollinger_signals},
+}
+
+def _ffill(values, valid, axis=1):
+    """Carry the last valid value forward along ``axis`` with index arithmetic instead of a loop"""
+    shape = [1] * values.ndim
+    shape[axis] = values.shape[axis]
+    positions = np.where(valid, np.arange(values.shape[axis]).reshape(shape), 0)
+    np.maximum.accumulate(positions, axis=axis, out=positions)
+    return np.take_along_axis(values, positions, axis=axis)
+
+def positions_from_signals(entries, exits):
+    """Long/flat positions (combos, dates, symbols) from entry and exit masks; entries win ties"""
+    signal = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    return np.nan_to_num(_ffill(signal, ~np.isnan(signal)))
+
+def evaluate(positions, returns, cost=0.0):
+    """Performance metrics per combo and symbol for end-of-bar positions.
+
+    A position taken at a bar's close earns the next bar's return; ``cost`` is
+    charged per unit of position change on the bar it happens. Returns a dict
+    of (combos, symbols) arrays keyed by METRIC_COLUMNS.
+    """
+    n_bars = positions.shape[1]
+    years = max(n_bars - 1, 1) / TRADING_DAYS
+    held_before = np.concatenate([np.zeros_like(positions[:, :1]), positions[:, :-1]], axis=1)
+    changes = np.abs(positions - held_before)
+    step = np.log1p(held_before * returns[None] - cost * changes)
+
+    log_equity = np.cumsum(step, axis=1)
+    peak = np.maximum(np.maximum.accumulate(log_equity, axis=1), 0)
+
+    # A trade runs from the equity before its entry bar to the equity on its exit bar
+    entered = (positions > 0) & (held_before == 0)
+    closed = (positions == 0) & (held_before > 0)
+    closed[:, -1] |= positions[:, -1] > 0
+    entry_equity = _ffill(np.where(entered, log_equity - step, np.nan), entered)
+    trade_pnl = np.where(closed, log_equity - entry_equity, np.nan)
+
+    trades = closed.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = (trade_pnl > 0).sum(axis=1) / trades
+    return {
+        'total_return': np.expm1(log_equity[:, -1]),
+        'annual_return': np.expm1(log_equity[:, -1] / years),
+        'max_drawdown': np.expm1((log_equity - peak).min(axis=1)),
+        'hit_rate': np.where(trades > 0, hit_rate, np.nan),
+        'trades': trades,
+        'turnover': changes.sum(axis=1) / years,
+        'exposure': positions.mean(axis=1),
+    }
+
+def run_grid(close, strategy, grid, cost=0.0):
+    """Backtest every combination of ``grid`` ({param: values}) for ``strategy`` on a close panel.
+
+    ``close`` is a date x symbol frame such as screener.build_price_panel
+    returns. Indicators are computed once per distinct indicator parameter and
+    all threshold combinations are evaluated together as NumPy arrays. Returns
+    a frame indexed by the strategy parameters and symbol with METRIC_COLUMNS.
+    """
+    spec = STRATEGIES[strategy]
+    close = close.astype(float)
+    prices = close.to_numpy()
+    returns = np.nan_to_num(prices[1:] / prices[:-1] - 1)
+    returns = np.vstack([np.zeros((1, prices.shape[1])), returns])
+
+    combos = pd.DataFrame(list(itertools.product(*(grid[name] for name in spec['params']))), columns=list(spec['params']))
+    chunk = max(1, GRID_CHUNK_ELEMENTS // max(1, prices.size))
+    cache, order, blocks = {}, [], []
+    for key, group in combos.groupby(list(spec['indicator']), sort=False):
+        key = key if isinstance(key, tuple) else (key,)
+        fixed = dict(zip(spec['indicator'], key))
+        for start in range(0, len(group), chunk):
+            part = group.iloc[start:start + chunk]
+            varying = {name: part[name].to_numpy(dtype=float) for name in spec['params'] if name not in fixed}
+            entries, exits = spec['signals'](close, cache, **fixed, **varying)
+            shape = (len(part),) + prices.shape
+            positions = positions_from_signals(np.broadcast_to(entries, shape), np.broadcast_to(exits, shape))
+            order.append(part)
+            blocks.append(evaluate(positions, returns, cost))
+
+    combos = pd.concat(order)
+    n_symbols = len(close.columns)
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(combos[name].to_numpy(), n_symbols) for name in spec['params']]
+        + [np.tile(close.columns.to_numpy(), len(combos))],
+        names=list(spec['params']) + ['Symbol']
+    )
+    return pd.DataFrame(
+        {name: np.concatenate([block[name] for block in blocks]).ravel() for name in METRIC_COLUMNS},
+        index=index
+    )
+
+def summarize(results, sort_by='annual_return'):
+    """Average each parameter combination's metrics across symbols, best first"""
+    params = [name for name in results.index.names if name != 'Symbol']
+    return results.groupby(level=params).mean().sort_values(sort_by, ascending=False)
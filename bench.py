@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the utils hot paths
+Times calculate_metrics, calculate_rsi, get_sample_stock_data, create_price_chart,
+format_number, the screener panel code, the fused indicator kernel and a backtest grid on synthetic data from 1 month to 30 years,
+plus cold-start import time and first render of the dashboard home page.
+
+Usage:
+    python bench.py                              # run and print results
+    python bench.py --save baseline.json         # store a baseline
+    python bench.py --compare baseline.json      # flag regressions against it
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Daily bar counts for the benchmarked history lengths
+SIZES = {
+    '1mo': 21,
+    '1y': 252,
+    '5y': 1260,
+    '30y': 7560,
+}
+# Universe sizes for the multi-symbol panel benchmarks
+PANEL_SYMBOLS = [20, 500]
+# Relative slowdown that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Startup cases run in a fresh interpreter; each snippet sets ``seconds`` for the timed part
+STARTUP_CASES = {
+    'startup.import[utils]': (
+        "start = time.perf_counter()\n"
+        "import utils\n"
+        "seconds = time.perf_counter() - start\n"
+    ),
+    'startup.first_render[home]': (
+        "from streamlit.testing.v1 import AppTest\n"
+        "app = AppTest.from_file('main.py', default_timeout=60)\n"
+        "start = time.perf_counter()\n"
+        "app.run()\n"
+        "seconds = time.perf_counter() - start\n"
+        "assert not app.exception, app.exception\n"
+    ),
+}
+_STARTUP_REPORT = "\nprint(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+
+def synthetic_frame(n_bars, seed=0):
+    """Random-walk OHLCV frame with ``n_bars`` business days"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.cumprod(1 + rng.normal(0.0005, 0.02, n_bars))
+    spread = np.abs(rng.normal(0, 0.01, n_bars))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, n_bars)),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100000, 2000000, n_bars),
+    }, index=pd.bdate_range(end='2024-12-31', periods=n_bars, name='Date'))
+
+def synthetic_panel(n_symbols, n_bars, seed=0):
+    """Date x symbol close panel of independent random walks"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.cumprod(1 + rng.normal(0.0005, 0.02, (n_bars, n_symbols)), axis=0)
+    return pd.DataFrame(
+        close,
+        index=pd.bdate_range(end='2024-12-31', periods=n_bars, name='Date'),
+        columns=[f"SYM{i}.NS" for i in range(n_symbols)]
+    )
+
+def build_cases():
+    """Benchmark cases as ``name -> (setup, fn)``; setup output is passed to fn"""
+    from utils import calculate_metrics, calculate_rsi, create_price_chart, format_number, get_sample_stock_data
+    from screener import compute_panel_indicators
+    from indicators import INDICATOR_COLUMNS, compute_indicator_panel
+    from backtest import run_grid
+
+    cases = {}
+    for label, n_bars in SIZES.items():
+        frame = synthetic_frame(n_bars)
+        with_metrics = calculate_metrics(frame.copy())
+        cases[f"calculate_metrics[{label}]"] = (lambda f=frame: f.copy(), calculate_metrics)
+        cases[f"calculate_rsi[{label}]"] = (lambda f=frame: f['Close'], calculate_rsi)
+        cases[f"create_price_chart[{label}]"] = (
+            lambda f=with_metrics: f,
+            lambda df: create_price_chart(df, 'BENCH.NS')
+        )
+
+    for period in ['1mo', '1y', '5y']:
+        cases[f"get_sample_stock_data[{period}]"] = (
+            lambda p=period: p,
+            lambda p: get_sample_stock_data('RELIANCE.NS', p)
+        )
+
+    numbers = np.random.default_rng(0).lognormal(10, 4, 10000).tolist()
+    cases["format_number[10k]"] = (lambda: numbers, lambda values: [format_number(v) for v in values])
+
+    for n_symbols in PANEL_SYMBOLS:
+        # Long and narrow is the shape where per-bar overhead, rather than per-element work, dominates
+        labels = ['1y', '5y'] + (['30y'] if n_symbols == min(PANEL_SYMBOLS) else [])
+        for label in labels:
+            panel = synthetic_panel(n_symbols, SIZES[label])
+            cases[f"compute_panel_indicators[{n_symbols}x{label}]"] = (lambda p=panel: p, compute_panel_indicators)
+            # The bare kernel, writing into a preallocated output as the nightly panel job does
+            cases[f"compute_indicator_panel[{n_symbols}x{label}]"] = (
+                lambda p=panel: (p.to_numpy(), np.empty((len(INDICATOR_COLUMNS),) + p.shape)),
+                lambda args: compute_indicator_panel(args[0], out=args[1])
+            )
+        panel = synthetic_panel(n_symbols, SIZES['1y'])
+        cases[f"calculate_metrics_loop[{n_symbols}x1y]"] = (
+            lambda p=panel: p,
+            lambda p: [calculate_metrics(p[[symbol]].rename(columns={symbol: 'Close'})) for symbol in p.columns]
+        )
+
+    panel = synthetic_panel(PANEL_SYMBOLS[0], SIZES['1y'])
+    rsi_grid = {'period': [14], 'lower': list(range(10, 50)), 'upper': list(range(50, 75))}
+    cases[f"backtest_rsi_grid[1000x{PANEL_SYMBOLS[0]}x1y]"] = (lambda p=panel: p, lambda p: run_grid(p, 'rsi', rsi_grid))
+    return cases
+
+def measure(setup, fn, repeat):
+    """Median wall time over ``repeat`` runs and peak traced memory of one run"""
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        fn(args)
+        times.append(time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    fn(args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'peak_mb': peak / 1e6}
+
+def measure_startup(code, repeat):
+    """Median time of a startup snippet over ``repeat`` fresh interpreters, and their peak RSS"""
+    env = dict(os.environ, STOCK_METRICS_PORT='0', STOCK_TELEMETRY_LOG_LEVEL='WARNING')
+    times, peaks = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', "import resource, time\n" + code + _STARTUP_REPORT],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        times.append(float(output[-2]))
+        # ru_maxrss is in kilobytes on Linux
+        peaks.append(int(output[-1]) / 1e3)
+    return {'seconds': statistics.median(times), 'peak_mb': max(peaks)}
+
+def run(name_filter=None, repeat=5):
+    """Run every case whose name contains ``name_filter``"""
+    results = {}
+    cases = [(name, lambda s=setup, f=fn: measure(s, f, repeat)) for name, (setup, fn) in build_cases().items()]
+    cases += [(name, lambda c=code: measure_startup(c, repeat)) for name, code in STARTUP_CASES.items()]
+    for name, run_case in cases:
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = run_case()
+        print(f"{name:<45} {results[name]['seconds'] * 1000:>10.2f} ms {results[name]['peak_mb']:>9.2f} MB")
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Names of cases slower (or hungrier) than the baseline by more than ``threshold``"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + threshold):
+                change = (result[metric] / base[metric] - 1) * 100
+                regressions.append(f"{name} {metric}: {base[metric]:.4g} -> {result[metric]:.4g} (+{change:.0f}%)")
+    return regressions
+
+def main():
+    """Benchmark entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the utils hot paths")
+    parser.add_argument('--filter', help="Only run cases whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument('--save', metavar='FILE', help="Save results as a JSON baseline")
+    parser.add_argument('--compare', metavar='FILE', help="Compare against a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown before flagging (default: 0.25)")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"✅ Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("❌ Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+# Default rolling window, in bars
+DEFAULT_WINDOW = 60
+# Recompute the running sums from the window buffer this often (in updates) to shed rounding drift
+RESYNC_EVERY = 250
+
+def returns_panel(close):
+    """Simple returns of a date x symbol close panel; a symbol's rows before its first close stay empty"""
+    return close.astype(float).pct_change(fill_method=None).iloc[1:]
+
+class RollingCorrelation:
+    """Rolling N x N covariance and correlation of a return panel, updated one bar at a time.
+
+    Keeps the last ``window`` return rows in a ring buffer together with the
+    pairwise sums the matrices are built from (counts, sums, sums of squares
+    and cross products over rows where both symbols have a return). Each new
+    bar adds its rank-one contribution and removes the one of the bar leaving
+    the window, so an update costs a few N x N array operations no matter how
+    long the window is. Missing returns (not yet listed, halted) are skipped
+    pairwise, as in ``DataFrame.rolling(window).corr()``.
+    """
+
+    def __init__(self, symbols, window=DEFAULT_WINDOW, min_periods=None):
+        self.symbols = list(symbols)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        n = len(self.symbols)
+        self._rows = np.full((window, n), np.nan)
+        self._next = 0
+        self.count = 0
+        self.last_date = None
+        self._updates = 0
+        self._zero_sums()
+
+    def _zero_sums(self):
+        n = len(self.symbols)
+        self._pairs = np.zeros((n, n))
+        self._sums = np.zeros((n, n))
+        self._squares = np.zeros((n, n))
+        self._cross = np.zeros((n, n))
+
+    def _add(self, rows, sign):
+        """Add (sign=1) or remove (sign=-1) return rows from the pairwise sums"""
+        valid = ~np.isnan(rows)
+        values = np.where(valid, rows, 0.0)
+        mask = valid.astype(float)
+        self._pairs += sign * (mask.T @ mask)
+        # _sums[i, j] is the sum of symbol i's returns over rows where j also has one
+        self._sums += sign * (values.T @ mask)
+        self._squares += sign * ((values * values).T @ mask)
+        self._cross += sign * (values.T @ values)
+
+    def _resync(self):
+        self._zero_sums()
+        self._add(self._rows[~np.isnan(self._rows).all(axis=1)], 1)
+
+    def _align(self, row):
+        if isinstance(row, pd.Series):
+            row = row.reindex(self.symbols)
+        return np.asarray(row, dtype=float).reshape(1, -1)
+
+    def update(self, row, date=None):
+        """Add one bar of returns (array in ``symbols`` order, or a Series indexed by symbol)"""
+        row = self._align(row)
+        if self.count == self.window:
+            self._add(self._rows[self._next:self._next + 1], -1)
+        else:
+            self.count += 1
+        self._rows[self._next] = row
+        self._next = (self._next + 1) % self.window
+        self._add(row, 1)
+        self.last_date = date if date is not None else self.last_date
+
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._resync()
+
+    def seed(self, returns):
+        """Fill the window from the last ``window`` rows of a return panel in one batch"""
+        returns = returns.reindex(columns=self.symbols).iloc[-self.window:]
+        self._rows[:] = np.nan
+        self._rows[:len(returns)] = returns.to_numpy(dtype=float)
+        self.count = len(returns)
+        self._next = len(returns) % self.window
+        self.last_date = returns.index[-1] if len(returns) else None
+        self._resync()
+
+    def sync(self, returns):
+        """Bring the window up to date with a return panel, feeding only bars newer than the last one seen.
+
+        Seeds from scratch on first use or when the panel no longer overlaps
+        the window. Returns the number of new bars.
+        """
+        if self.last_date is None or self.last_date not in returns.index:
+            self.seed(returns)
+            return len(returns)
+        new = returns.loc[returns.index > self.last_date].reindex(columns=self.symbols)
+        for date, row in zip(new.index, new.to_numpy(dtype=float)):
+            self.update(row, date)
+        return len(new)
+
+    def _moments(self):
+        pairs = np.where(self._pairs >= max(self.min_periods, 2), self._pairs, np.nan)
+        cov = (self._cross - self._sums * self._sums.T / pairs) / (pairs - 1)
+        var = (self._squares - self._sums * self._sums / pairs) / (pairs - 1)
+        return cov, var
+
+    def covariance(self):
+        """Current N x N covariance matrix as a symbol-labelled frame"""
+        cov, _ = self._moments()
+        return pd.DataFrame(cov, index=self.symbols, columns=self.symbols)
+
+    def correlation(self):
+        """Current N x N correlation matrix as a symbol-labelled frame"""
+        cov, var = self._moments()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(cov / np.sqrt(var * var.T), -1, 1)
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+def top_pairs(matrix, n=10, ascending=False):
+    """The ``n`` most (or, with ``ascending``, least) correlated distinct pairs of a correlation matrix"""
+    rows, cols = np.triu_indices(len(matrix), k=1)
+    values = matrix.to_numpy()[rows, cols]
+    pairs = pd.DataFrame({
+        'Symbol 1': matrix.index[rows],
+        'Symbol 2': matrix.columns[cols],
+        'Correlation': values,
+    }).dropna()
+    return pairs.sort_values('Correlation', ascending=ascending).head(n).reset_index(drop=True)
@@ -0,0 +1,321 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# Columns produced by utils.calculate_metrics, in order
+INDICATOR_COLUMNS = ['SMA_20', 'SMA_50', 'RSI', 'MACD', 'Signal_Line', 'BB_middle', 'BB_upper', 'BB_lower']
+# Rows of the compute_indicator_panel output, by column name
+INDICATOR_ROWS = {column: i for i, column in enumerate(INDICATOR_COLUMNS)}
+# Bars x symbols per block of compute_indicator_panel's rolling passes; bounds the size of its temporaries (about 2 MB each)
+PANEL_BLOCK_ELEMENTS = 1 << 18
+# Rows per matrix product in the blocked EMA scan
+EMA_BLOCK = 32
+
+class RollingWindow:
+    """Fixed-size window keeping its mean and variance up to date in O(1) per value"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Number of non-zero values, so an all-zero window reports an exact 0 mean
+        self.nonzero = 0
+
+    def push(self, value):
+        """Add a value, evicting the oldest one once the window is full"""
+        if len(self.values) < self.size:
+            self.values.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(self.values)
+            self.m2 += delta * (value - self.mean)
+        else:
+            old = self.values.popleft()
+            self.values.append(value)
+            self._swap(old, value)
+            self.nonzero -= old != 0
+        self.nonzero += value != 0
+
+    def replace_last(self, value):
+        """Replace the newest value, e.g. when the current bar is revised"""
+        old = self.values[-1]
+        self.values[-1] = value
+        self._swap(old, value)
+        self.nonzero += (value != 0) - (old != 0)
+
+    def _swap(self, old, new):
+        """Welford update for replacing one value of the window with another"""
+        n = len(self.values)
+        old_mean = self.mean
+        self.mean += (new - old) / n
+        self.m2 += (new - old) * (new - self.mean + old - old_mean)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def average(self):
+        """Window mean, NaN until the window is full (pandas min_periods semantics)"""
+        if not self.full:
+            return math.nan
+        return 0.0 if self.nonzero == 0 else self.mean
+
+    def std(self):
+        """Sample standard deviation (ddof=1), NaN until the window is full"""
+        if not self.full or self.size < 2:
+            return math.nan
+        return math.sqrt(max(self.m2, 0.0) / (self.size - 1))
+
+class IndicatorEngine:
+    """Streaming version of utils.calculate_metrics.
+
+    Keeps rolling windows, EMA state and RSI gains/losses so each new bar costs
+    O(1) per indicator instead of recomputing the whole history.
+    """
+
+    def __init__(self, rsi_period=14):
+        self.sma_20 = RollingWindow(20)
+        self.sma_50 = RollingWindow(50)
+        self.gains = RollingWindow(rsi_period)
+        self.losses = RollingWindow(rsi_period)
+        self.ema_12 = None
+        self.ema_26 = None
+        self.signal = None
+        self.last_close = None
+        self._previous_close = None
+        self._previous_emas = (None, None, None)
+        self.values = dict.fromkeys(INDICATOR_COLUMNS, math.nan)
+
+    @classmethod
+    def from_history(cls, df, rsi_period=14):
+        """Build an engine primed with every close in a history frame"""
+        engine = cls(rsi_period=rsi_period)
+        for close in df['Close'].tolist():
+            engine.update(close)
+        return engine
+
+    @staticmethod
+    def _ema(previous, value, span):
+        """One step of an adjust=False exponential moving average"""
+        if previous is None:
+            return value
+        alpha = 2.0 / (span + 1)
+        return (1 - alpha) * previous + alpha * value
+
+    def update(self, close):
+        """Feed the close of a new bar and return the indicator values for it"""
+        close = float(close)
+        # calculate_rsi treats the first (undefined) change as zero gain and loss
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        self.sma_20.push(close)
+        self.sma_50.push(close)
+        self.gains.push(max(delta, 0.0))
+        self.losses.push(max(-delta, 0.0))
+
+        self._previous_close = self.last_close
+        self._previous_emas = (self.ema_12, self.ema_26, self.signal)
+        self.last_close = close
+        return self._compute(close)
+
+    def revise(self, close):
+        """Replace the close of the most recent bar (e.g. a live intraday update)"""
+        if self.last_close is None:
+            return self.update(close)
+        close = float(close)
+        delta = 0.0 if self._previous_close is None else close - self._previous_close
+        self.sma_20.replace_last(close)
+        self.sma_50.replace_last(close)
+        self.gains.replace_last(max(delta, 0.0))
+        self.losses.replace_last(max(-delta, 0.0))
+
+        self.ema_12, self.ema_26, self.signal = self._previous_emas
+        self.last_close = close
+        return self._compute(close)
+
+    def _compute(self, close):
+        """Advance the EMAs and derive every indicator for the current bar"""
+        self.ema_12 = self._ema(self.ema_12, close, 12)
+        self.ema_26 = self._ema(self.ema_26, close, 26)
+        macd = self.ema_12 - self.ema_26
+        self.signal = self._ema(self.signal, macd, 9)
+
+        gain, loss = self.gains.average(), self.losses.average()
+        if math.isnan(gain) or math.isnan(loss):
+            rsi = math.nan
+        elif loss == 0:
+            rsi = 100.0 if gain > 0 else math.nan
+        else:
+            rsi = 100 - (100 / (1 + gain / loss))
+
+        middle = self.sma_20.average()
+        band = 2 * self.sma_20.std()
+        self.values = {
+            'SMA_20': middle,
+            'SMA_50': self.sma_50.average(),
+            'RSI': rsi,
+            'MACD': macd,
+            'Signal_Line': self.signal,
+            'BB_middle': middle,
+            'BB_upper': middle + band,
+            'BB_lower': middle - band,
+        }
+        return self.values
+
+def _running_total(values):
+    """Cumulative sums down the columns of a 2D array, after a leading row of zeros"""
+    total = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=total[1:])
+    return total
+
+def _trailing_sums(total, window):
+    """Sums over every trailing ``window`` rows, from a running total; NaN before the first full window"""
+    sums = np.full((len(total) - 1, total.shape[1]), np.nan)
+    np.subtract(total[window:], total[:-window], out=sums[window - 1:])
+    return sums
+
+def _rolling_indicators(close, out, rsi_period):
+    """SMA, Bollinger and RSI rows of compute_indicator_panel for one block of symbols"""
+    valid = ~np.isnan(close)
+    # Each symbol's first close; prices are centered on it so the running sums of squares stay well conditioned
+    first = close[valid.argmax(axis=0), np.arange(close.shape[1])]
+    first[~valid.any(axis=0)] = 0.0
+    centered = np.where(valid, close - first, 0.0)
+    counts = _running_total(valid)
+    row = INDICATOR_ROWS
+
+    def complete(window):
+        """Rows whose trailing window holds ``window`` closes (pandas min_periods=window)"""
+        return _trailing_sums(counts, window) > window - 0.5
+
+    # SMA_20 and the Bollinger rows share one 20-bar mean and deviation; SMA_50 reuses the running total of closes
+    closes = _running_total(centered)
+    sums = _trailing_sums(closes, 20)
+    squares = _trailing_sums(_running_total(np.square(centered, out=centered)), 20)
+    mean = sums / 20
+    # Sample standard deviation (ddof=1) from the window's sum and sum of squares
+    squares -= sums * mean
+    std = np.sqrt(np.maximum(squares, 0.0, out=squares) / 19, out=squares)
+    mean += first
+    mean[~complete(20)] = np.nan
+    out[row['SMA_20']] = mean
+    out[row['BB_middle']] = mean
+    std *= 2
+    np.add(mean, std, out=out[row['BB_upper']])
+    np.subtract(mean, std, out=out[row['BB_lower']])
+
+    mean = _trailing_sums(closes, 50)
+    mean /= 50
+    mean += first
+    mean[~complete(50)] = np.nan
+    out[row['SMA_50']] = mean
+
+    # Like calculate_rsi, a symbol's first change counts as zero gain and loss
+    delta = np.zeros_like(close)
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+    delta[~np.isfinite(delta)] = 0.0
+    gain = _trailing_sums(_running_total(np.maximum(delta, 0.0)), rsi_period)
+    loss = _trailing_sums(_running_total(np.maximum(-delta, 0.0)), rsi_period)
+    rsi = 100 - (100 / (1 + gain / loss))
+    rsi[~complete(rsi_period)] = np.nan
+    out[row['RSI']] = rsi
+
+def _ema_scan(values, span, out):
+    """adjust=False EMA down the columns of ``values`` (seeded with its first row) into ``out``.
+
+    The recursion over each block of EMA_BLOCK rows is one lower-triangular
+    matrix product plus the previous block's last value carried in, so the
+    Python loop runs once per block instead of once per row; every weight is
+    at most 1, so the blocks are as stable as the row-by-row recursion.
+    """
+    alpha = 2.0 / (span + 1)
+    lags = np.arange(EMA_BLOCK)
+    gap = lags[:, None] - lags[None, :]
+    weights = np.where(gap >= 0, alpha * (1 - alpha) ** np.maximum(gap, 0), 0.0)
+    carry = (1 - alpha) ** (lags + 1)
+    previous = values[0]
+    for start in range(0, len(values), EMA_BLOCK):
+        rows = values[start:start + EMA_BLOCK]
+        n = len(rows)
+        block = out[start:start + n]
+        np.matmul(weights[:n, :n], rows, out=block)
+        block += carry[:n, None] * previous
+        previous = block[-1]
+    return out
+
+def _ema_indicators(close, out):
+    """MACD and signal rows of compute_indicator_panel for one block of symbols"""
+    # MACD is a difference of EMAs, so they can run on moves from the first close
+    # (a flat series then gives an exact 0, as in pandas)
+    valid = ~np.isnan(close)
+    if valid.all():
+        prices = close - close[0]
+        macd = _ema_scan(prices, 12, np.empty_like(prices))
+        macd -= _ema_scan(prices, 26, np.empty_like(prices))
+        out[INDICATOR_ROWS['MACD']] = macd
+        out[INDICATOR_ROWS['Signal_Line']] = _ema_scan(macd, 9, prices)
+        return
+
+    bars = np.arange(len(close))[:, None]
+    first = valid.argmax(axis=0)
+    last = len(close) - 1 - valid[::-1].argmax(axis=0)
+    unlisted = bars < first
+    # Forward-fill gaps and back-fill the pre-listing rows from the first close, so
+    # each EMA starts from a symbol's first close and holds until it is listed
+    filled = np.where(valid, bars, 0)
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    np.maximum(filled, first, out=filled)
+    prices = np.take_along_axis(close, filled, axis=0)
+    prices -= prices[0]
+
+    macd = _ema_scan(prices, 12, np.empty_like(prices))
+    macd -= _ema_scan(prices, 26, np.empty_like(prices))
+    # ewm(adjust=False) stands still on missing closes, so a delisted symbol's MACD
+    # holds its last value, and the signal line keeps converging on it
+    if (last < len(close) - 1).any():
+        macd = np.take_along_axis(macd, np.minimum(bars, last), axis=0)
+    macd[unlisted] = 0.0
+    signal = _ema_scan(macd, 9, prices)
+
+    macd[unlisted] = np.nan
+    signal[unlisted] = np.nan
+    out[INDICATOR_ROWS['MACD']] = macd
+    out[INDICATOR_ROWS['Signal_Line']] = signal
+
+def compute_indicator_panel(close, out=None, rsi_period=14):
+    """Every calculate_metrics indicator for a (time x symbol) close array, in a few vectorized passes.
+
+    ``close`` is a T x N array; a symbol's rows before its first close and after
+    its last one may be NaN, interior gaps should be forward-filled first (as
+    write_panel does). Results are written into ``out``, an array of shape
+    ``(len(INDICATOR_COLUMNS), T, N)`` in INDICATOR_COLUMNS order (any float
+    dtype and memory layout, so a transposed view of the caller's own array
+    works), which is allocated when omitted and returned.
+
+    Each rolling mean is a difference of running totals: one total of closes
+    serves SMA_20, SMA_50 and the Bollinger middle, one of squared closes the
+    band width, and the 20-bar mean and deviation are computed once for all
+    four rows that use them. The EMAs are blocked scans, a few dozen rows per
+    matrix product, so no Python loop runs per row. Everything runs over
+    blocks of symbols, so temporaries stay small however wide the universe.
+    Values match the per-symbol pandas results to rounding error.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim != 2:
+        raise ValueError("close must be a 2D (time x symbol) array")
+    shape = (len(INDICATOR_COLUMNS),) + close.shape
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"out must have shape {shape}, got {out.shape}")
+    n_bars, n_symbols = close.shape
+    if n_bars == 0 or n_symbols == 0:
+        return out
+
+    block = max(1, PANEL_BLOCK_ELEMENTS // n_bars)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for start in range(0, n_symbols, block):
+            columns = slice(start, start + block)
+            _rolling_indicators(close[:, columns], out[:, :, columns], rsi_period)
+            _ema_indicators(close[:, columns], out[:, :, columns])
+    return out
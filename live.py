@@ -0,0 +1,152 @@
+import random
+from datetime import time as clock
+
+import pandas as pd
+
+from indicators import INDICATOR_COLUMNS, IndicatorEngine
+
+# NSE cash market session, in exchange time
+MARKET_TIMEZONE = 'Asia/Kolkata'
+MARKET_OPEN = clock(9, 15)
+MARKET_CLOSE = clock(15, 30)
+
+# Seconds between quote polls in live mode
+DEFAULT_POLL_SECONDS = 5
+POLL_CHOICES = [2, 5, 10, 30, 60]
+
+def market_is_open(now=None):
+    """Whether the NSE cash session is running (weekdays 09:15-15:30 IST; exchange holidays are not known)"""
+    now = pd.Timestamp.now(tz=MARKET_TIMEZONE) if now is None else pd.Timestamp(now).tz_convert(MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+class YahooQuoteFeed:
+    """Polls the configured data provider for the latest quote of one symbol"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def next(self):
+        """The latest ``{'price', 'volume', 'time'}`` quote, or None when unavailable"""
+        from utils import get_quote
+        return get_quote(self.symbol)
+
+class ReplayQuoteFeed:
+    """Replays OHLCV bars as a stream of intrabar quotes, for testing live mode without a network.
+
+    Each bar becomes ``ticks_per_bar`` quotes stamped inside the bar: its open,
+    its high and low (in random order), then its close. Volume is reported as a
+    running total for the day, as Yahoo does.
+    """
+
+    def __init__(self, bars, ticks_per_bar=4, seed=None):
+        self._quotes = []
+        random_ = random.Random(seed)
+        bar_size = pd.Series(bars.index).diff().median() if len(bars) > 1 else pd.Timedelta(days=1)
+        day, day_volume = None, 0
+        for bar_time, bar in bars.iterrows():
+            if bar_time.normalize() != day:
+                day, day_volume = bar_time.normalize(), 0
+            extremes = [bar['High'], bar['Low']]
+            random_.shuffle(extremes)
+            prices = [bar['Open']] + extremes + [bar['Close']]
+            # Spread the path over the requested number of ticks, always ending on the close
+            path = [prices[round(i * (len(prices) - 1) / max(ticks_per_bar - 1, 1))] for i in range(ticks_per_bar)]
+            for i, price in enumerate(path):
+                volume = day_volume + bar['Volume'] * (i + 1) / len(path)
+                self._quotes.append({
+                    'price': float(price),
+                    'volume': int(volume),
+                    'time': bar_time + bar_size * i / len(path),
+                })
+            day_volume += bar['Volume']
+        self._position = 0
+
+    def __len__(self):
+        return len(self._quotes) - self._position
+
+    def next(self):
+        """The next quote, or None once the replay is exhausted"""
+        if self._position >= len(self._quotes):
+            return None
+        quote = self._quotes[self._position]
+        self._position += 1
+        return quote
+
+class LiveSession:
+    """Keeps an analysis frame and its price chart current from a quote feed.
+
+    A quote inside the last bar revises that bar (high, low, close, volume) and
+    its indicators through IndicatorEngine.revise; a quote past it opens a new
+    bar through IndicatorEngine.update. Either way only the last row of ``df``
+    and the last point of each chart trace change; history is never refetched
+    and indicators are never recomputed over the whole frame.
+    """
+
+    def __init__(self, df, feed, figure=None):
+        # Private copies, so patches don't leak into the memoized analysis results
+        self.df = df.copy()
+        self.feed = feed
+        self.figure = None
+        if figure is not None:
+            import plotly.graph_objects as go
+            self.figure = go.Figure(figure)
+        self.engine = IndicatorEngine.from_history(self.df)
+        self.bar_size = pd.Series(self.df.index).diff().median() if len(self.df) > 1 else pd.Timedelta(days=1)
+        self._day_volume = None
+        self.last_quote = None
+
+    def _bar_start(self, when):
+        """Start of the bar a quote time falls in, counted in whole bars from the last bar"""
+        last = self.df.index[-1]
+        if self.bar_size >= pd.Timedelta(days=1):
+            return when.normalize() if when.normalize() > last else last
+        return last + self.bar_size * ((when - last) // self.bar_size)
+
+    def _bar_volume(self, day_volume, when, bar_time):
+        """Volume of the bar a quote lands in, from the day's running volume the quote carries"""
+        if day_volume is None:
+            return None
+        previous, self._day_volume = self._day_volume, (when.normalize(), day_volume)
+        if self.bar_size >= pd.Timedelta(days=1):
+            return day_volume
+        # Intraday bars grow by the volume traded since the previous quote of the same day
+        added = day_volume - previous[1] if previous and previous[0] == when.normalize() else 0
+        current = self.df['Volume'].iloc[-1] if bar_time == self.df.index[-1] else 0
+        return current + max(added, 0)
+
+    def apply(self, quote):
+        """Fold one quote into the last bar; returns the patched bar's time, or None for a stale quote"""
+        when = pd.Timestamp(quote['time'])
+        tz = self.df.index.tz
+        when = when.tz_convert(tz) if tz is not None else when.tz_localize(None)
+        last = self.df.index[-1]
+        if when < last:
+            return None
+
+        price = float(quote['price'])
+        bar_time = self._bar_start(when)
+        volume = self._bar_volume(quote.get('volume'), when, bar_time)
+        if bar_time == last:
+            row = self.df.loc[last]
+            bar = {'High': max(row['High'], price), 'Low': min(row['Low'], price), 'Close': price}
+            if volume is not None:
+                bar['Volume'] = volume
+            values = self.engine.revise(price)
+        else:
+            bar = {'Open': price, 'High': price, 'Low': price, 'Close': price, 'Volume': volume or 0}
+            values = self.engine.update(price)
+
+        columns = list(bar) + INDICATOR_COLUMNS
+        self.df.loc[bar_time, columns] = list(bar.values()) + [values[column] for column in INDICATOR_COLUMNS]
+        self.last_quote = quote
+        if self.figure is not None:
+            from utils import patch_price_chart
+            patch_price_chart(self.figure, self.df, bar_time)
+        return bar_time
+
+    def poll(self):
+        """Fetch one quote from the feed and apply it; returns the patched bar's time or None"""
+        quote = self.feed.next()
+        if quote is None:
+            return None
+        return self.apply(quote)
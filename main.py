@@ -1,8 +1,13 @@
+import os
 import streamlit as st
-import pandas as pd
-from utils import get_stock_data, get_sample_stock_data, calculate_metrics, create_price_chart, format_number, get_stock_news, get_company_profile, get_financial_metrics
+from universe import DEFAULT_STOCKS
+from caching import LRUCache
+import telemetry
 from datetime import datetime, timedelta
 
+# pandas, plotly and utils are imported inside the page functions that need them,
+# so the home page renders without paying for them
+
 # Page configuration
 st.set_page_config(
     page_title="Indian Stock Analysis Dashboard",
@@ -59,29 +64,7 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Indian Fortune 500 stocks
-default_stocks = [
-    'RELIANCE.NS',    # Reliance Industries
-    'TCS.NS',         # Tata Consultancy Services
-    'HDFCBANK.NS',    # HDFC Bank
-    'INFY.NS',        # Infosys
-    'ICICIBANK.NS',   # ICICI Bank
-    'HINDUNILVR.NS',  # Hindustan Unilever
-    'SBIN.NS',        # State Bank of India
-    'BHARTIARTL.NS',  # Bharti Airtel
-    'ITC.NS',         # ITC Limited
-    'KOTAKBANK.NS',   # Kotak Mahindra Bank
-    'LT.NS',          # Larsen & Toubro
-    'BAJFINANCE.NS',  # Bajaj Finance
-    'ASIANPAINT.NS',  # Asian Paints
-    'MARUTI.NS',      # Maruti Suzuki
-    'WIPRO.NS',       # Wipro
-    'TITAN.NS',       # Titan Company
-    'ADANIENT.NS',    # Adani Enterprises
-    'ULTRACEMCO.NS',  # UltraTech Cement
-    'SUNPHARMA.NS',   # Sun Pharma
-    'AXISBANK.NS'     # Axis Bank
-]
+default_stocks = DEFAULT_STOCKS
 
 # Initialize session state variables
 if 'current_page' not in st.session_state:
@@ -93,413 +76,657 @@ if 'custom_start_date' not in st.session_state:
 if 'custom_end_date' not in st.session_state:
     st.session_state.custom_end_date = datetime.now()
 
+# Bar size used for short periods; longer periods use daily bars
+PERIOD_INTERVALS = {
+    '1d': '5m',
+    '5d': '15m',
+}
+
+# Entries kept per session across fetch results, indicator frames and figures
+ANALYSIS_CACHE_SIZE = 24
+# Rolling correlation trackers kept per session (one per universe, period and window)
+CORRELATION_TRACKERS = 4
+
+def get_session_cache():
+    """Per-session LRU cache so reruns that change nothing skip fetch, metrics and chart building"""
+    if 'analysis_cache' not in st.session_state:
+        st.session_state.analysis_cache = LRUCache(maxsize=ANALYSIS_CACHE_SIZE)
+    return st.session_state.analysis_cache
+
+def data_version(hist):
+    """Cheap fingerprint of a history frame that changes whenever new bars arrive"""
+    return (len(hist), hist.index[-1].value, float(hist['Close'].iloc[-1]))
+
+def memoized_stage(key, stage, compute):
+    """Session-cached result of a timed stage, counting cache hits and misses"""
+    cache = get_session_cache()
+    value = cache.get(key)
+    if value is not None:
+        telemetry.increment('analysis_cache_total', stage=stage, result='hit')
+        return value
+    telemetry.increment('analysis_cache_total', stage=stage, result='miss')
+    with telemetry.span(stage):
+        value = compute()
+    cache.put(key, value)
+    return value
+
+def cached_analysis(range_key, hist, symbol, time_period):
+    """Indicator frame and price chart for a history frame, memoized on its data version"""
+    from utils import calculate_metrics, create_price_chart
+    version = data_version(hist)
+    df = memoized_stage(
+        ('metrics',) + range_key + (version,), 'calculate_metrics',
+        lambda: calculate_metrics(hist.copy())
+    )
+    fig = memoized_stage(
+        ('figure',) + range_key + (version,), 'create_price_chart',
+        lambda: create_price_chart(df, symbol, time_period)
+    )
+    return df, fig
+
 def show_analysis(selected_stock, time_period):
     """Show the analysis page content"""
+    from live import DEFAULT_POLL_SECONDS, POLL_CHOICES, market_is_open
+    from sources import load_stock_data
+    from utils import format_number, get_company_profile, get_financial_metrics, get_stock_news
+
     st.title(f"📈 {selected_stock} Analysis")
 
-    # Load data
+    # Load data: memory, disk, live Yahoo, last-known-good and sample tiers, each with a deadline
     with st.spinner('Loading stock data...'):
+        start_date = end_date = None
         if time_period == 'custom':
             start_date = st.session_state.custom_start_date.strftime('%Y-%m-%d')
             end_date = st.session_state.custom_end_date.strftime('%Y-%m-%d')
-            hist_data, stock_info = get_stock_data(selected_stock, 'custom', start_date, end_date)
+        interval = PERIOD_INTERVALS.get(time_period, '1d')
+        range_key = (selected_stock, time_period, start_date, end_date, interval)
+
+        with telemetry.span('fetch', symbol=selected_stock, period=time_period) as fields:
+            hist_data, stock_info, provenance = load_stock_data(
+                selected_stock, time_period, start_date, end_date, interval, cache=get_session_cache()
+            )
+            fields['cache'] = 'hit' if provenance['source'] == 'memory' else 'miss'
+            fields['source'] = provenance['source']
+            telemetry.increment('analysis_cache_total', stage='fetch', result=fields['cache'])
+
+    if hist_data is None:
+        show_load_error(selected_stock, stock_info)
+        return
+
+    show_provenance(provenance)
+    demo = provenance['origin'] == 'sample'
+
+    # Calculate metrics
+    df, price_chart = cached_analysis((provenance['origin'],) + range_key, hist_data, selected_stock, time_period)
+
+    # Create tabs for different sections
+    tab1, tab2, tab3, tab4 = st.tabs([
+        "📊 Price & Technical Analysis",
+        "🏢 Company Profile",
+        "💰 Financial Metrics",
+        "📰 News"
+    ])
+
+    with tab1:
+        # Live mode patches the last bar from quotes while the market is open
+        market_open = market_is_open()
+        live_enabled = False
+        if not demo:
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                live_enabled = st.toggle(
+                    "🔴 Live quotes", value=False, disabled=not market_open,
+                    help="Poll the latest quote and update the last bar in place (market hours only)"
+                )
+            with col2:
+                poll_seconds = st.select_slider(
+                    'Refresh every (seconds)', options=POLL_CHOICES, value=DEFAULT_POLL_SECONDS,
+                    disabled=not live_enabled
+                )
+
+        # Technical Analysis Chart
+        if live_enabled:
+            st.fragment(show_live_chart, run_every=poll_seconds)(range_key, df, price_chart, selected_stock)
         else:
-            hist_data, stock_info = get_stock_data(selected_stock, time_period)
+            with telemetry.span('render_chart'):
+                st.plotly_chart(price_chart, use_container_width=True)
 
-        if hist_data is not None and stock_info is not None and stock_info not in ["NO_DATA", "INCOMPLETE_INFO", "RATE_LIMITED", "MAX_RETRIES_EXCEEDED"] and not str(stock_info).startswith("ERROR:"):
-            # Calculate metrics
-            df = calculate_metrics(hist_data)
+        # Summary metrics in a single row
+        col1, col2, col3, col4 = st.columns(4)
 
-            # Create tabs for different sections
-            tab1, tab2, tab3, tab4 = st.tabs([
-                "📊 Price & Technical Analysis",
-                "🏢 Company Profile",
-                "💰 Financial Metrics",
-                "📰 News"
-            ])
+        with col1:
+            st.markdown(f"""
+            <div class="stock-metric">
+                Current Price
+                <br/>
+                <span class="indicator-up">₹{format_number(stock_info.get('currentPrice', 0))}</span>
+            </div>
+            """, unsafe_allow_html=True)
 
-            with tab1:
-                # Technical Analysis Chart
-                st.plotly_chart(create_price_chart(df, selected_stock, time_period), use_container_width=True)
+        with col2:
+            change = stock_info.get('regularMarketChangePercent', 0)
+            indicator_class = "indicator-up" if change >= 0 else "indicator-down"
+            st.markdown(f"""
+            <div class="stock-metric">
+                24h Change
+                <br/>
+                <span class="{indicator_class}">{change:.2f}%</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+        with col3:
+            st.markdown(f"""
+            <div class="stock-metric">
+                52 Week High
+                <br/>
+                <span>₹{format_number(stock_info.get('fiftyTwoWeekHigh', 0))}</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+        with col4:
+            st.markdown(f"""
+            <div class="stock-metric">
+                52 Week Low
+                <br/>
+                <span>₹{format_number(stock_info.get('fiftyTwoWeekLow', 0))}</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+        # Add Market Status Indicator from the NSE session hours (sample data has no live quote)
+        if not demo:
+            market_status = "Open" if market_open else "Closed"
+            status_color = "#4BFF4B" if market_status == "Open" else "#FF4B4B"
+            st.markdown(f"""
+            <div style='text-align: right; margin-top: 20px;'>
+                <span style='background-color: {status_color}; padding: 5px 10px; border-radius: 4px;'>
+                    Market {market_status}
+                </span>
+            </div>
+            """, unsafe_allow_html=True)
+
+    with tab2:
+        # Company Profile with enhanced information
+        company_profile = get_company_profile(stock_info)
+
+        st.subheader("Company Overview")
+        st.write(company_profile['Business Summary'])
+
+        # Enhanced company metrics
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("### Industry Information")
+            st.markdown(f"""
+            - **Sector**: {company_profile['Sector']}
+            - **Industry**: {company_profile['Industry']}
+            - **Employees**: {company_profile['Full Time Employees']}
+            """)
 
-                # Summary metrics in a single row
-                col1, col2, col3, col4 = st.columns(4)
+        with col2:
+            st.markdown("### Trading Information")
+            st.markdown(f"""
+            - **Exchange**: {stock_info.get('exchange', 'N/A')}
+            - **Currency**: {stock_info.get('currency', 'N/A')}
+            - **Market Cap**: ₹{format_number(stock_info.get('marketCap', 0))}
+            """)
+
+        with col3:
+            st.markdown("### Key Dates")
+            st.markdown(f"""
+            - **Earnings Date**: {stock_info.get('earningsDate', ['N/A'])[0] if stock_info.get('earningsDate') else 'N/A'}
+            - **Ex-Dividend Date**: {stock_info.get('exDividendDate', 'N/A')}
+            - **Fiscal Year End**: {stock_info.get('lastFiscalYearEnd', 'N/A')}
+            """)
+
+        # Company contact information
+        st.subheader("Company Contact")
+        col1, col2 = st.columns(2)
+        with col1:
+            if company_profile['Website'] != 'N/A':
+                st.markdown(f"🌐 [Official Website]({company_profile['Website']})")
+            else:
+                st.write("Website not available")
 
-                with col1:
-                    st.markdown(f"""
-                    <div class="stock-metric">
-                        Current Price
-                        <br/>
-                        <span class="indicator-up">₹{format_number(stock_info.get('currentPrice', 0))}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
+        with col2:
+            st.markdown(f"📍 **Headquarters**: {stock_info.get('city', 'N/A')}, {stock_info.get('country', 'N/A')}")
+
+        # Add sustainability score if available
+        if stock_info.get('sustainabilityScore'):
+            st.subheader("ESG Scores")
+            esg_col1, esg_col2, esg_col3 = st.columns(3)
+            with esg_col1:
+                st.metric("Environmental Score", stock_info.get('environmentScore', 'N/A'))
+            with esg_col2:
+                st.metric("Social Score", stock_info.get('socialScore', 'N/A'))
+            with esg_col3:
+                st.metric("Governance Score", stock_info.get('governanceScore', 'N/A'))
+
+    with tab3:
+        # Financial Metrics
+        financial_metrics = get_financial_metrics(stock_info)
+
+        # Valuation Metrics
+        st.subheader("Valuation Metrics")
+        col1, col2, col3 = st.columns(3)
 
-                with col2:
-                    change = stock_info.get('regularMarketChangePercent', 0)
-                    indicator_class = "indicator-up" if change >= 0 else "indicator-down"
-                    st.markdown(f"""
-                    <div class="stock-metric">
-                        24h Change
-                        <br/>
-                        <span class="{indicator_class}">{change:.2f}%</span>
-                    </div>
-                    """, unsafe_allow_html=True)
+        with col1:
+            st.metric("Market Cap", financial_metrics['Market Cap'])
+            st.metric("P/E Ratio", financial_metrics['P/E Ratio'])
+            st.metric("EPS (TTM)", financial_metrics['EPS (TTM)'])
 
-                with col3:
-                    st.markdown(f"""
-                    <div class="stock-metric">
-                        52 Week High
-                        <br/>
-                        <span>₹{format_number(stock_info.get('fiftyTwoWeekHigh', 0))}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
+        with col2:
+            st.metric("Revenue (TTM)", financial_metrics['Revenue (TTM)'])
+            st.metric("Profit Margin", financial_metrics['Profit Margin'])
+            st.metric("Operating Margin", financial_metrics['Operating Margin'])
+
+        with col3:
+            st.metric("ROE", financial_metrics['ROE'])
+            st.metric("Beta", financial_metrics['Beta'])
+            st.metric("Dividend Yield", financial_metrics['Dividend Yield'])
+
+        # Additional Financial Ratios
+        st.subheader("Financial Ratios")
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.metric("Debt to Equity", financial_metrics['Debt to Equity'])
 
-                with col4:
+        with col2:
+            st.metric("Current Ratio", financial_metrics['Current Ratio'])
+
+    with tab4:
+        # News Section
+        if demo:
+            st.info("📝 **Note:** News requires real-time data. Try again when Yahoo Finance is available.")
+            st.markdown("""
+            ### Sample News Headlines
+            - **Company Q3 Results:** Strong performance across key metrics
+            - **Market Update:** Sector outlook remains positive
+            - **Analyst Rating:** Upgraded to 'Buy' with revised price target
+            """)
+        else:
+            news_df = get_stock_news(selected_stock)
+            if not news_df.empty:
+                for _, row in news_df.iterrows():
                     st.markdown(f"""
-                    <div class="stock-metric">
-                        52 Week Low
-                        <br/>
-                        <span>₹{format_number(stock_info.get('fiftyTwoWeekLow', 0))}</span>
+                    <div class="news-item">
+                        <h4>{row['Title']}</h4>
+                        <p>{row['Date']}</p>
+                        <a href="{row['Link']}" target="_blank">Read More</a>
                     </div>
+                    <hr>
                     """, unsafe_allow_html=True)
+            else:
+                st.info("No recent news available")
+
+def show_live_chart(range_key, df, figure, symbol):
+    """Price chart patched with the latest quote on every rerun of its fragment"""
+    import pandas as pd
+    from live import MARKET_TIMEZONE, LiveSession, YahooQuoteFeed, market_is_open
+
+    # One live session per page; it restarts when the underlying history changes
+    key = range_key + (data_version(df),)
+    current = st.session_state.get('live_session')
+    if current is None or current[0] != key:
+        current = (key, LiveSession(df, YahooQuoteFeed(symbol), figure))
+        st.session_state.live_session = current
+    session = current[1]
+
+    if market_is_open():
+        with telemetry.span('live_update', symbol=symbol) as fields:
+            bar_time = session.poll()
+            fields['patched'] = bar_time is not None
+    with telemetry.span('render_chart', live=True):
+        # Streamlit re-sends the whole figure; patch_price_chart keeps it within the point budget
+        st.plotly_chart(session.figure, use_container_width=True)
+
+    if session.last_quote is not None:
+        quote_time = pd.Timestamp(session.last_quote['time']).tz_convert(MARKET_TIMEZONE)
+        st.caption(f"🔴 Last quote ₹{session.last_quote['price']:,.2f} at {quote_time:%H:%M:%S} IST")
+    else:
+        st.caption("Waiting for the first quote...")
+
+# Why the live tier did not answer, for the fallback notices
+FALLBACK_REASONS = {
+    "RATE_LIMITED": "Yahoo Finance is currently limiting requests",
+    "TIMEOUT": "Yahoo Finance did not respond in time",
+    "BUSY": "Yahoo Finance is responding slowly",
+    "MAX_RETRIES_EXCEEDED": "Yahoo Finance could not be reached",
+    "INCOMPLETE_INFO": "Yahoo Finance returned incomplete data",
+}
 
-                # Add Market Status Indicator
-                market_status = "Open" if stock_info.get('regularMarketOpen', None) else "Closed"
-                status_color = "#4BFF4B" if market_status == "Open" else "#FF4B4B"
-                st.markdown(f"""
-                <div style='text-align: right; margin-top: 20px;'>
-                    <span style='background-color: {status_color}; padding: 5px 10px; border-radius: 4px;'>
-                        Market {market_status}
-                    </span>
-                </div>
-                """, unsafe_allow_html=True)
-
-            with tab2:
-                # Company Profile with enhanced information
-                company_profile = get_company_profile(stock_info)
-
-                st.subheader("Company Overview")
-                st.write(company_profile['Business Summary'])
-
-                # Enhanced company metrics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.markdown("### Industry Information")
-                    st.markdown(f"""
-                    - **Sector**: {company_profile['Sector']}
-                    - **Industry**: {company_profile['Industry']}
-                    - **Employees**: {company_profile['Full Time Employees']}
-                    """)
+def show_provenance(provenance):
+    """Tell the user where the data on the page came from"""
+    origin = provenance['origin']
+    reason = provenance.get('reason', '')
+    why = FALLBACK_REASONS.get(reason, "Live data is unavailable")
+    as_of = provenance['as_of'].strftime('%Y-%m-%d %H:%M')
+    if origin == 'sample':
+        st.warning(f"🚫 **{why} - Using Demo Mode**")
+        st.info("""
+        **Showing the dashboard with realistic sample data so you can explore all features:**
+        - Interactive price charts with technical indicators
+        - Company metrics and financial ratios
+        - Complete dashboard functionality
+
+        **To get real data:** Wait 10-15 minutes and try again, or use the app during off-peak hours.
+        """)
+    elif origin == 'last_known_good':
+        st.warning(f"⚠️ **{why} - showing the last stored data (up to {as_of})**")
+    else:
+        label = {'live': 'Yahoo Finance', 'disk': 'local store'}[origin]
+        cached = " (cached)" if provenance['source'] == 'memory' else ""
+        st.caption(f"Data: {label}{cached}, last bar {as_of}")
+
+def show_load_error(symbol, error):
+    """Explain why no data could be shown and suggest other stocks"""
+    if error == "NO_DATA":
+        st.error(f"📊 **No Data Available**")
+        st.warning(f"""
+        The stock symbol **{symbol}** appears to be invalid or delisted.
+
+        **Please try:**
+        - Selecting a different stock from the dropdown
+        - Checking if the symbol is correct
+        """)
+
+    elif error == "INCOMPLETE_INFO":
+        st.error("⚠️ **Incomplete Stock Information**")
+        st.warning("""
+        The stock data was partially loaded but missing key information.
+
+        **Please try:**
+        - Refreshing the page
+        - Trying again in a few minutes
+        - Selecting a different stock
+        """)
+
+    elif error == "MAX_RETRIES_EXCEEDED":
+        st.error("🔄 **Maximum Retries Exceeded**")
+        st.warning("""
+        We tried multiple times but couldn't load the stock data.
+
+        **This usually means:**
+        - Yahoo Finance is experiencing issues
+        - Your internet connection might be unstable
+        - The specific stock data is temporarily unavailable
+
+        **Please try:**
+        - Waiting 10-15 minutes and trying again
+        - Selecting a different stock
+        - Refreshing the browser page
+        """)
+
+    elif str(error).startswith("ERROR:"):
+        error_detail = str(error).replace("ERROR: ", "")
+        st.error("❌ **Technical Error Occurred**")
+        st.warning(f"""
+        **Error Details:** {error_detail}
+
+        **Please try:**
+        - Refreshing the page
+        - Trying again in a few minutes
+        - Contact support if the problem persists
+        """)
 
-                with col2:
-                    st.markdown("### Trading Information")
-                    st.markdown(f"""
-                    - **Exchange**: {stock_info.get('exchange', 'N/A')}
-                    - **Currency**: {stock_info.get('currency', 'N/A')}
-                    - **Market Cap**: ₹{format_number(stock_info.get('marketCap', 0))}
-                    """)
+    else:
+        st.error('❌ **Error Loading Stock Data**')
+        st.warning("""
+        **General troubleshooting:**
+        1. Wait a few minutes and try again
+        2. Select a different stock
+        3. Refresh the browser page
+        4. Check your internet connection
+        """)
+
+    # Suggest alternative stocks
+    st.markdown("### 🔄 Try These Popular Stocks Instead:")
+    suggested_stocks = ['TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS', 'WIPRO.NS']
+    cols = st.columns(len(suggested_stocks))
+    for i, stock in enumerate(suggested_stocks):
+        if stock != symbol:  # Don't suggest the same stock
+            with cols[i]:
+                if st.button(f"📈 {stock.replace('.NS', '')}", key=f"suggest_{stock}"):
+                    st.session_state.selected_stock = stock
+                    st.session_state.current_page = 'analysis'
+                    st.rerun()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_screener_data(symbols, period):
+    """Load the screener snapshot from the universe's compact, memory-mapped panel"""
+    from indicators import INDICATOR_COLUMNS
+    from panel import load_universe_panel
+    from screener import screen_snapshot
+    panel, status = load_universe_panel(symbols, period)
+    if panel is None:
+        return None, status
+    close = panel.field('Close').ffill(limit_area='inside')
+    return screen_snapshot(close, {column: panel.field(column) for column in INDICATOR_COLUMNS}), status
+
+def show_screener():
+    """Show the universe screener page"""
+    import pandas as pd
+    from screener import SCREEN_COLUMNS, OPERATORS, load_universe, apply_rules
+
+    st.title("🔍 Stock Screener")
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        period = st.selectbox('History', ['3mo', '6mo', '1y', '2y', '5y'], index=2)
+    with col2:
+        universe_file = st.file_uploader(
+            "Universe file (optional)",
+            type=['txt', 'csv'],
+            help="One symbol per line, or a CSV with a 'Symbol' column (e.g. the NIFTY 500 list)"
+        )
 
-                with col3:
-                    st.markdown("### Key Dates")
-                    st.markdown(f"""
-                    - **Earnings Date**: {stock_info.get('earningsDate', ['N/A'])[0] if stock_info.get('earningsDate') else 'N/A'}
-                    - **Ex-Dividend Date**: {stock_info.get('exDividendDate', 'N/A')}
-                    - **Fiscal Year End**: {stock_info.get('lastFiscalYearEnd', 'N/A')}
-                    """)
-
-                # Company contact information
-                st.subheader("Company Contact")
-                col1, col2 = st.columns(2)
-                with col1:
-                    if company_profile['Website'] != 'N/A':
-                        st.markdown(f"🌐 [Official Website]({company_profile['Website']})")
-                    else:
-                        st.write("Website not available")
-
-                with col2:
-                    st.markdown(f"📍 **Headquarters**: {stock_info.get('city', 'N/A')}, {stock_info.get('country', 'N/A')}")
-
-                # Add sustainability score if available
-                if stock_info.get('sustainabilityScore'):
-                    st.subheader("ESG Scores")
-                    esg_col1, esg_col2, esg_col3 = st.columns(3)
-                    with esg_col1:
-                        st.metric("Environmental Score", stock_info.get('environmentScore', 'N/A'))
-                    with esg_col2:
-                        st.metric("Social Score", stock_info.get('socialScore', 'N/A'))
-                    with esg_col3:
-                        st.metric("Governance Score", stock_info.get('governanceScore', 'N/A'))
-
-            with tab3:
-                # Financial Metrics
-                financial_metrics = get_financial_metrics(stock_info)
-
-                # Valuation Metrics
-                st.subheader("Valuation Metrics")
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    st.metric("Market Cap", financial_metrics['Market Cap'])
-                    st.metric("P/E Ratio", financial_metrics['P/E Ratio'])
-                    st.metric("EPS (TTM)", financial_metrics['EPS (TTM)'])
-
-                with col2:
-                    st.metric("Revenue (TTM)", financial_metrics['Revenue (TTM)'])
-                    st.metric("Profit Margin", financial_metrics['Profit Margin'])
-                    st.metric("Operating Margin", financial_metrics['Operating Margin'])
-
-                with col3:
-                    st.metric("ROE", financial_metrics['ROE'])
-                    st.metric("Beta", financial_metrics['Beta'])
-                    st.metric("Dividend Yield", financial_metrics['Dividend Yield'])
-
-                # Additional Financial Ratios
-                st.subheader("Financial Ratios")
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    st.metric("Debt to Equity", financial_metrics['Debt to Equity'])
-
-                with col2:
-                    st.metric("Current Ratio", financial_metrics['Current Ratio'])
-
-            with tab4:
-                # News Section
-                news_df = get_stock_news(selected_stock)
-                if not news_df.empty:
-                    for _, row in news_df.iterrows():
-                        st.markdown(f"""
-                        <div class="news-item">
-                            <h4>{row['Title']}</h4>
-                            <p>{row['Date']}</p>
-                            <a href="{row['Link']}" target="_blank">Read More</a>
-                        </div>
-                        <hr>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.info("No recent news available")
-        else:
-            # Show specific error messages based on the error type
-            if stock_info == "RATE_LIMITED":
-                st.warning("🚫 **Yahoo Finance Rate Limited - Using Demo Mode**")
-                st.info("""
-                **Yahoo Finance is currently limiting requests, but don't worry!**
-                
-                I'll show you the dashboard with realistic sample data so you can explore all features:
-                - Interactive price charts with technical indicators
-                - Company metrics and financial ratios  
-                - Complete dashboard functionality
-                
-                **To get real data:** Wait 10-15 minutes and try again, or use the app during off-peak hours.
-                """)
-                
-                # Load sample data instead
-                st.markdown("---")
-                st.markdown("### 📊 Demo Mode - Sample Data Analysis")
-                
-                with st.spinner('Loading sample data...'):
-                    sample_hist, sample_info = get_sample_stock_data(selected_stock, time_period)
-                    
-                if sample_hist is not None and sample_info is not None:
-                    # Use the same analysis logic but with sample data
-                    df = calculate_metrics(sample_hist)
-                    
-                    # Create tabs for different sections
-                    tab1, tab2, tab3, tab4 = st.tabs([
-                        "📊 Price & Technical Analysis",
-                        "🏢 Company Profile", 
-                        "💰 Financial Metrics",
-                        "📰 News"
-                    ])
-                    
-                    with tab1:
-                        st.info("📝 **Note:** This chart shows sample data due to Yahoo Finance rate limiting")
-                        
-                        # Technical Analysis Chart
-                        st.plotly_chart(create_price_chart(df, selected_stock, time_period), use_container_width=True)
-                        
-                        # Summary metrics in a single row
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        with col1:
-                            st.markdown(f"""
-                            <div class="stock-metric">
-                                Current Price
-                                <br/>
-                                <span class="indicator-up">₹{format_number(sample_info.get('currentPrice', 0))}</span>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col2:
-                            change = sample_info.get('regularMarketChangePercent', 0)
-                            indicator_class = "indicator-up" if change >= 0 else "indicator-down"
-                            st.markdown(f"""
-                            <div class="stock-metric">
-                                24h Change
-                                <br/>
-                                <span class="{indicator_class}">{change:.2f}%</span>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col3:
-                            st.markdown(f"""
-                            <div class="stock-metric">
-                                52 Week High
-                                <br/>
-                                <span>₹{format_number(sample_info.get('fiftyTwoWeekHigh', 0))}</span>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col4:
-                            st.markdown(f"""
-                            <div class="stock-metric">
-                                52 Week Low
-                                <br/>
-                                <span>₹{format_number(sample_info.get('fiftyTwoWeekLow', 0))}</span>
-                            </div>
-                            """, unsafe_allow_html=True)
-                    
-                    with tab2:
-                        st.info("📝 **Note:** This shows sample company data due to Yahoo Finance rate limiting")
-                        
-                        # Company Overview
-                        st.subheader("Company Overview")
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.markdown("### Basic Information")
-                            st.markdown(f"""
-                            - **Company**: {sample_info.get('longName', 'Sample Company')}
-                            - **Sector**: {sample_info.get('sector', 'Technology')}
-                            - **Industry**: {sample_info.get('industry', 'Software')}
-                            - **Employees**: {format_number(sample_info.get('fullTimeEmployees', 100000))}
-                            """)
-                        
-                        with col2:
-                            st.markdown("### Trading Information")
-                            st.markdown(f"""
-                            - **Exchange**: {sample_info.get('exchange', 'NSE')}
-                            - **Currency**: {sample_info.get('currency', 'INR')}
-                            - **Market Cap**: ₹{format_number(sample_info.get('marketCap', 0))}
-                            """)
-                        
-                        with col3:
-                            st.markdown("### Sample Metrics")
-                            st.markdown(f"""
-                            - **P/E Ratio**: {sample_info.get('trailingPE', 'N/A')}
-                            - **Beta**: {sample_info.get('beta', 'N/A')}
-                            - **Dividend Yield**: {sample_info.get('dividendYield', 0)*100:.2f}%
-                            """)
-                    
-                    with tab3:
-                        st.info("📝 **Note:** These are sample financial metrics due to Yahoo Finance rate limiting")
-                        
-                        # Financial Metrics using sample data
-                        financial_metrics = get_financial_metrics(sample_info)
-                        
-                        # Valuation Metrics
-                        st.subheader("Valuation Metrics")
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.metric("Market Cap", financial_metrics['Market Cap'])
-                            st.metric("P/E Ratio", financial_metrics['P/E Ratio'])
-                            st.metric("EPS (TTM)", financial_metrics['EPS (TTM)'])
-                        
-                        with col2:
-                            st.metric("Revenue (TTM)", financial_metrics['Revenue (TTM)'])
-                            st.metric("Profit Margin", financial_metrics['Profit Margin'])
-                            st.metric("Operating Margin", financial_metrics['Operating Margin'])
-                        
-                        with col3:
-                            st.metric("ROE", financial_metrics['ROE'])
-                            st.metric("Beta", financial_metrics['Beta'])
-                            st.metric("Dividend Yield", financial_metrics['Dividend Yield'])
-                    
-                    with tab4:
-                        st.info("📝 **Note:** News requires real-time data. Try again when Yahoo Finance is available.")
-                        st.markdown("""
-                        ### Sample News Headlines
-                        - **Company Q3 Results:** Strong performance across key metrics
-                        - **Market Update:** Sector outlook remains positive
-                        - **Analyst Rating:** Upgraded to 'Buy' with revised price target
-                        """)
-                
-                return  # Exit early since we've shown the demo
-                
-            elif stock_info == "NO_DATA":
-                st.error(f"📊 **No Data Available**")
-                st.warning(f"""
-                The stock symbol **{selected_stock}** appears to be invalid or delisted.
-                
-                **Please try:**
-                - Selecting a different stock from the dropdown
-                - Checking if the symbol is correct
-                """)
-                
-            elif stock_info == "INCOMPLETE_INFO":
-                st.error("⚠️ **Incomplete Stock Information**")
-                st.warning("""
-                The stock data was partially loaded but missing key information.
-                
-                **Please try:**
-                - Refreshing the page
-                - Trying again in a few minutes
-                - Selecting a different stock
-                """)
-                
-            elif stock_info == "MAX_RETRIES_EXCEEDED":
-                st.error("🔄 **Maximum Retries Exceeded**")
-                st.warning("""
-                We tried multiple times but couldn't load the stock data.
-                
-                **This usually means:**
-                - Yahoo Finance is experiencing issues
-                - Your internet connection might be unstable
-                - The specific stock data is temporarily unavailable
-                
-                **Please try:**
-                - Waiting 10-15 minutes and trying again
-                - Selecting a different stock
-                - Refreshing the browser page
-                """)
-                
-            elif str(stock_info).startswith("ERROR:"):
-                error_detail = str(stock_info).replace("ERROR: ", "")
-                st.error("❌ **Technical Error Occurred**")
-                st.warning(f"""
-                **Error Details:** {error_detail}
-                
-                **Please try:**
-                - Refreshing the page
-                - Trying again in a few minutes
-                - Contact support if the problem persists
-                """)
-                
+    if universe_file is not None:
+        import os
+        import tempfile
+        suffix = os.path.splitext(universe_file.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(universe_file.getvalue())
+        symbols = load_universe(f.name)
+        os.unlink(f.name)
+    else:
+        symbols = load_universe()
+
+    with st.spinner(f'Loading {len(symbols)} stocks...'):
+        snapshot, status = load_screener_data(tuple(symbols), period)
+
+    failed = {symbol: code for symbol, code in status.items() if code != "OK"}
+    if failed:
+        st.warning(f"Could not load {len(failed)} of {len(status)} stocks: " + ", ".join(sorted(failed)))
+    if snapshot is None:
+        st.error("❌ **No stock data could be loaded for the screener**")
+        return
+
+    screen_tab, correlation_tab = st.tabs(["🔍 Screen", "🔗 Correlation"])
+
+    with screen_tab:
+        # Filter rules: value is a number or another column name
+        st.subheader("Filter Rules")
+        rules_df = st.data_editor(
+            pd.DataFrame([
+                {'Indicator': 'RSI', 'Operator': '<', 'Value': '30'},
+                {'Indicator': 'Close', 'Operator': '>', 'Value': 'SMA_50'},
+            ]),
+            num_rows='dynamic',
+            column_config={
+                'Indicator': st.column_config.SelectboxColumn(options=SCREEN_COLUMNS, required=True),
+                'Operator': st.column_config.SelectboxColumn(options=list(OPERATORS), required=True),
+                'Value': st.column_config.TextColumn(help="A number or a column name such as SMA_50"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+        rules = []
+        for _, rule in rules_df.dropna().iterrows():
+            value = str(rule['Value']).strip()
+            if value in SCREEN_COLUMNS:
+                rules.append((rule['Indicator'], rule['Operator'], value))
             else:
-                st.error('❌ **Error Loading Stock Data**')
-                st.warning("""
-                **General troubleshooting:**
-                1. Wait a few minutes and try again
-                2. Select a different stock
-                3. Refresh the browser page
-                4. Check your internet connection
-                """)
-            
-            # Suggest alternative stocks
-            st.markdown("### 🔄 Try These Popular Stocks Instead:")
-            suggested_stocks = ['TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS', 'WIPRO.NS']
-            cols = st.columns(len(suggested_stocks))
-            for i, stock in enumerate(suggested_stocks):
-                if stock != selected_stock:  # Don't suggest the same stock
-                    with cols[i]:
-                        if st.button(f"📈 {stock.replace('.NS', '')}", key=f"suggest_{stock}"):
-                            st.session_state.selected_stock = stock
-                            st.session_state.current_page = 'analysis'
-                            st.rerun()
+                try:
+                    rules.append((rule['Indicator'], rule['Operator'], float(value)))
+                except ValueError:
+                    st.error(f"Invalid value '{value}': use a number or one of {', '.join(SCREEN_COLUMNS)}")
+                    rules = None
+                    break
+
+        if rules is not None:
+            results = apply_rules(snapshot, rules)
+            st.subheader(f"Results ({len(results)} of {len(snapshot)} stocks)")
+            st.dataframe(results.round(2), use_container_width=True)
+
+    with correlation_tab:
+        show_correlation(tuple(symbols), period)
+
+def correlation_tracker(symbols, period, window):
+    """Rolling correlation tracker for a universe, kept for the session so new bars update it incrementally"""
+    from correlation import RollingCorrelation
+    if 'correlation_trackers' not in st.session_state:
+        st.session_state.correlation_trackers = LRUCache(maxsize=CORRELATION_TRACKERS)
+    return st.session_state.correlation_trackers.get_or_set(
+        (symbols, period, window),
+        lambda: RollingCorrelation(symbols, window=window, min_periods=window // 2)
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_universe_returns(symbols, period):
+    """Daily returns of the universe's compact panel, or None when no symbol could be loaded"""
+    from correlation import returns_panel
+    from panel import load_universe_panel
+    universe, _ = load_universe_panel(symbols, period)
+    if universe is None:
+        return None
+    return returns_panel(universe.field('Close').ffill(limit_area='inside'))
+
+def show_correlation(symbols, period):
+    """Rolling return correlation heatmap for the screener universe"""
+    from correlation import top_pairs
+    from utils import create_correlation_heatmap
+
+    window = st.select_slider('Rolling window (bars)', options=[20, 60, 120, 250], value=60)
+    returns = load_universe_returns(symbols, period)
+    if returns is None:
+        st.error("❌ **No stock data could be loaded for the correlation matrix**")
+        return
+
+    tracker = correlation_tracker(symbols, period, window)
+    with telemetry.span('correlation', symbols=len(symbols), window=window) as fields:
+        fields['new_bars'] = tracker.sync(returns)
+        matrix = tracker.correlation()
+
+    if tracker.count < tracker.min_periods:
+        st.info(f"Need at least {tracker.min_periods} bars of history for a {window}-bar correlation")
+        return
+    st.caption(f"Daily return correlation over the last {tracker.count} bars to {tracker.last_date:%Y-%m-%d}")
+    st.plotly_chart(create_correlation_heatmap(matrix), use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Most Correlated")
+        st.dataframe(top_pairs(matrix).round(2), use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("Least Correlated")
+        st.dataframe(top_pairs(matrix, ascending=True).round(2), use_container_width=True, hide_index=True)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_comparison_data(symbols, period):
+    """Aligned close panel for a watchlist, loaded through one batch request"""
+    from screener import build_price_panel
+    return build_price_panel(list(symbols), period)
+
+def show_compare():
+    """Compare the performance of several stocks in one chart"""
+    import numpy as np
+    import pandas as pd
+    from screener import panel_rsi
+    from utils import create_comparison_chart, normalized_performance
+
+    st.title("📊 Compare Stocks")
+
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        symbols = st.multiselect(
+            'Watchlist',
+            default_stocks,
+            default=[s for s in ['TCS.NS', 'INFY.NS', 'WIPRO.NS'] if s in default_stocks],
+            format_func=lambda x: x.replace('.NS', '')
+        )
+    with col2:
+        period = st.selectbox('History', ['1mo', '3mo', '6mo', '1y', '2y', '5y'], index=3)
+    with col3:
+        show_rsi = st.checkbox('RSI overlay', value=True)
+
+    if len(symbols) < 2:
+        st.info("Select at least two stocks to compare")
+        return
+
+    with st.spinner(f'Loading {len(symbols)} stocks...'):
+        with telemetry.span('fetch_watchlist', symbols=len(symbols), period=period):
+            close, status = load_comparison_data(tuple(symbols), period)
+
+    failed = {symbol: code for symbol, code in status.items() if code != "OK"}
+    if failed:
+        st.warning(f"Could not load {len(failed)} of {len(status)} stocks: " + ", ".join(sorted(failed)))
+    if close.shape[1] < 2:
+        st.error("❌ **Not enough stock data could be loaded for a comparison**")
+        return
+
+    # Shared by the chart's RSI pane and the summary table
+    rsi = panel_rsi(close)
+    with telemetry.span('render_chart', chart='comparison', series=close.shape[1]):
+        fig = create_comparison_chart(close, rsi if show_rsi else None)
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Summary over the same common window as the chart
+    performance = normalized_performance(close)
+    window = close.loc[performance.index[0]:]
+    returns = window.pct_change(fill_method=None)
+    summary = pd.DataFrame({
+        'Return %': performance.iloc[-1],
+        'Volatility % (ann.)': returns.std() * np.sqrt(252) * 100,
+        'Max Drawdown %': (window / window.cummax() - 1).min() * 100,
+        'RSI': rsi.iloc[-1],
+    }).sort_values('Return %', ascending=False)
+    summary.index = summary.index.str.replace('.NS', '')
+    st.dataframe(summary.round(2), use_container_width=True)
+
+def show_diagnostics():
+    """Sidebar debug panel with recent stage timings and cache/rate-limit counters"""
+    import pandas as pd
+    with st.sidebar.expander("🩺 Diagnostics", expanded=True):
+        spans = list(telemetry.recent_spans)[-30:][::-1]
+        if spans:
+            st.dataframe(pd.DataFrame(spans), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No stages timed yet")
+        counts = [
+            {'metric': name, 'labels': ', '.join(f"{k}={v}" for k, v in labels), 'value': round(value, 3)}
+            for (name, labels), value in sorted(telemetry.counters().items())
+        ]
+        if counts:
+            st.dataframe(pd.DataFrame(counts), use_container_width=True, hide_index=True)
+        if telemetry.start_metrics_server():
+            st.caption(f"Prometheus metrics: http://{telemetry.METRICS_HOST}:{telemetry.METRICS_PORT}/metrics")
+
+# Local Prometheus endpoint (no-op after the first run in this process)
+telemetry.start_metrics_server()
+
+@st.cache_resource(show_spinner=False)
+def start_cache_warmer():
+    """Start the cache warmer once per server process, so it shares the sessions' Yahoo rate budget and circuit breaker"""
+    from warmer import start_background_warmer
+    return start_background_warmer()
+
+# run.py asks for the warmer unless started with --no-warm
+if os.environ.get('STOCK_WARMER') == '1':
+    start_cache_warmer()
 
 # Sidebar
 st.sidebar.title('Indian Stock Analysis Dashboard')
+diagnostics_enabled = st.sidebar.checkbox("Show diagnostics", value=False)
 
 # Handle navigation
 if st.session_state.current_page == 'analysis':
@@ -508,6 +735,18 @@ if st.session_state.current_page == 'analysis':
         st.rerun()
 
     show_analysis(st.session_state.selected_stock, st.session_state.time_period)
+elif st.session_state.current_page == 'screener':
+    if st.sidebar.button('← Back to Home'):
+        st.session_state.current_page = 'home'
+        st.rerun()
+
+    show_screener()
+elif st.session_state.current_page == 'compare':
+    if st.sidebar.button('← Back to Home'):
+        st.session_state.current_page = 'home'
+        st.rerun()
+
+    show_compare()
 else:
     # Home page
     selected_stock = st.sidebar.selectbox(
@@ -571,6 +810,14 @@ else:
         st.session_state.current_page = 'analysis'
         st.rerun()
 
+    st.sidebar.markdown("---")
+    if st.sidebar.button('🔍 Stock Screener'):
+        st.session_state.current_page = 'screener'
+        st.rerun()
+    if st.sidebar.button('📊 Compare Stocks'):
+        st.session_state.current_page = 'compare'
+        st.rerun()
+
     # Welcome message on home page
     st.title("Welcome to Indian Stock Analysis Dashboard")
     st.markdown("""
@@ -585,6 +832,8 @@ else:
     - **Company Profile**: Get detailed company information and ESG scores
     - **Financial Metrics**: Analyze key financial ratios and performance metrics
     - **Latest News**: Stay updated with company-specific news
+    - **Stock Screener**: Filter the whole stock universe by indicator rules
+    - **Compare Stocks**: Overlay the performance and RSI of a watchlist in one chart
     """)
 
     # Display available stocks in a grid
@@ -594,6 +843,9 @@ else:
         company_name = stock.replace('.NS', '')
         cols[i % 4].markdown(f"• {company_name}")
 
+if diagnostics_enabled:
+    show_diagnostics()
+
 # Footer
 st.markdown("""
 <div style='text-align: center; color: #666666; padding: 20px;'>
@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+from caching import SingleFlight
+from indicators import INDICATOR_COLUMNS
+
+# Compact universe panels live here, one directory per universe and period
+PANEL_PATH = os.environ.get('STOCK_PANEL_PATH', os.path.join('.cache', 'panels'))
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+_VOLUME_MAX = np.iinfo(np.uint32).max
+# File in a panel directory naming its live version subdirectory
+CURRENT_FILE = 'CURRENT'
+# Versions kept per panel, so readers that resolved CURRENT just before a swap can still open theirs
+KEEP_VERSIONS = 2
+
+# Concurrent rebuilds of one universe panel (e.g. several Streamlit sessions) share a single write
+_rebuilds = SingleFlight()
+# Serializes publishing (version rename, pointer swap, pruning) between writer threads
+_publish_lock = threading.Lock()
+
+def _version_dir(path):
+    """Directory holding a panel's live version (``path`` itself for panels written before versioning)"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+# Files of a panel written before versioning, directly in its directory
+_LEGACY_FILES = ['meta.json', 'dates.npy', 'prices.npy', 'volume.npy', 'indicators.npy']
+
+def _prune_versions(path):
+    """Remove all but the newest KEEP_VERSIONS published versions (never the live one) and any unversioned files"""
+    for name in _LEGACY_FILES:
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    current = os.path.basename(_version_dir(path))
+    versions = sorted(name for name in os.listdir(path) if name.startswith('v-'))
+    for name in versions[:-KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+def _utc_ns(index):
+    """A DatetimeIndex as UTC nanosecond integers (naive indexes are taken as UTC)"""
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+def write_panel(path, frames, indicators=True, **metadata):
+    """Write ``{symbol: OHLCV frame}`` as a compact panel directory.
+
+    Prices are stored as one float32 (symbols, 4, dates) array and volume as
+    uint32 (symbols, dates), both on a single shared date axis, with NaN
+    prices where a symbol has no bar. ``indicators`` also stores the
+    calculate_metrics columns as float32. Extra ``metadata`` is kept in
+    meta.json. Each write goes to a new version subdirectory of ``path`` and
+    is published by atomically replacing the CURRENT pointer file, so readers
+    never see a half-written panel and concurrent writers never collide.
+    """
+    symbols = list(frames)
+    stamps = {symbol: _utc_ns(frame.index) for symbol, frame in frames.items()}
+    dates = np.unique(np.concatenate(list(stamps.values()))) if stamps else np.array([], dtype=np.int64)
+    tz = next((str(frame.index.tz) for frame in frames.values() if frame.index.tz is not None), 'UTC')
+
+    prices = np.full((len(symbols), len(PRICE_COLUMNS), len(dates)), np.nan, dtype=np.float32)
+    volume = np.zeros((len(symbols), len(dates)), dtype=np.uint32)
+    spans = []
+    for i, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        positions = np.searchsorted(dates, stamps[symbol])
+        prices[i][:, positions] = frame[PRICE_COLUMNS].to_numpy(dtype=np.float32).T
+        if 'Volume' in frame.columns:
+            volume[i, positions] = np.clip(frame['Volume'].fillna(0).to_numpy(), 0, _VOLUME_MAX)
+        spans.append([int(positions.min()), int(positions.max()) + 1] if len(positions) else [0, 0])
+
+    os.makedirs(path, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=path, prefix='.tmp-')
+    np.save(os.path.join(tmp, 'dates.npy'), dates)
+    np.save(os.path.join(tmp, 'prices.npy'), prices)
+    np.save(os.path.join(tmp, 'volume.npy'), volume)
+    if indicators and symbols:
+        from indicators import compute_indicator_panel
+        close = pd.DataFrame(prices[:, 3, :].T.astype(np.float64)).ffill(limit_area='inside')
+        stacked = np.empty((len(symbols), len(INDICATOR_COLUMNS), len(dates)), dtype=np.float32)
+        # The kernel writes (indicator, bar, symbol); a transposed view fills the stored layout in place
+        compute_indicator_panel(close.to_numpy(), out=stacked.transpose(1, 2, 0))
+        np.save(os.path.join(tmp, 'indicators.npy'), stacked)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'symbols': symbols, 'tz': tz, 'spans': spans,
+                   'created_at': time.time(), **metadata}, f, default=str)
+
+    with _publish_lock:
+        # Versions are named when published, so pruning can tell old from new and never sees a partial one
+        version = f"v-{time.time_ns():020d}-{os.path.basename(tmp)[len('.tmp-'):]}"
+        os.rename(tmp, os.path.join(path, version))
+        fd, pointer = tempfile.mkstemp(dir=path, prefix=f".{CURRENT_FILE}-")
+        with os.fdopen(fd, 'w') as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(path, CURRENT_FILE))
+        # Open memory maps of pruned versions keep reading their files until they are closed
+        _prune_versions(path)
+
+class Panel:
+    """Read-only, memory-mapped view of a panel written by write_panel.
+
+    The arrays are mapped rather than loaded, so every process that opens the
+    same panel shares one copy through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        path = _version_dir(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.symbols = self.meta['symbols']
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.dates = pd.DatetimeIndex(
+            np.load(os.path.join(path, 'dates.npy')), tz='UTC', name='Date'
+        ).tz_convert(self.meta['tz'])
+        self.prices = np.load(os.path.join(path, 'prices.npy'), mmap_mode='r')
+        self.volume = np.load(os.path.join(path, 'volume.npy'), mmap_mode='r')
+        indicators_path = os.path.join(path, 'indicators.npy')
+        self.indicators = np.load(indicators_path, mmap_mode='r') if os.path.exists(indicators_path) else None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._positions
+
+    @property
+    def nbytes(self):
+        """Size of the mapped arrays"""
+        arrays = [self.prices, self.volume] + ([self.indicators] if self.indicators is not None else [])
+        return sum(array.nbytes for array in arrays)
+
+    def frame(self, symbol, indicators=False):
+        """OHLCV (and optionally indicator) frame for one symbol whose columns are views into the panel.
+
+        The frame is trimmed to the symbol's own first and last bar. It can be
+        passed straight to calculate_metrics and create_price_chart; new columns
+        are added alongside without copying the mapped ones.
+        """
+        i = self._positions[symbol]
+        first, last = self.meta['spans'][i]
+        columns = {column: self.prices[i, j, first:last] for j, column in enumerate(PRICE_COLUMNS)}
+        columns['Volume'] = self.volume[i, first:last]
+        if indicators and self.indicators is not None:
+            columns.update({column: self.indicators[i, j, first:last] for j, column in enumerate(INDICATOR_COLUMNS)})
+        return pd.DataFrame(columns, index=self.dates[first:last], copy=False)
+
+    def field(self, column):
+        """Date x symbol frame of one price or indicator column, as a view into the panel"""
+        if column in PRICE_COLUMNS:
+            values = self.prices[:, PRICE_COLUMNS.index(column), :]
+        elif column == 'Volume':
+            values = self.volume
+        else:
+            values = self.indicators[:, INDICATOR_COLUMNS.index(column), :]
+        return pd.DataFrame(values.T, index=self.dates, columns=self.symbols, copy=False)
+
+def open_panel(path):
+    """Memory-map a panel directory read-only"""
+    return Panel(path)
+
+def universe_panel_path(symbols, period, directory=None):
+    """Panel directory for a universe and history period"""
+    key = zlib.crc32(','.join(symbols).encode())
+    return os.path.join(directory or PANEL_PATH, f"{period}-{key:08x}")
+
+def load_universe_panel(symbols, period='1y', max_age=None, directory=None):
+    """Compact panel for a universe, rebuilt from the batch history API when older than ``max_age``.
+
+    Returns ``(panel, status)`` with the per-symbol status map from the last
+    rebuild; ``panel`` is None when no symbol could be loaded.
+    """
+    from utils import STORE_REFRESH_SECONDS, get_stock_data_batch
+    max_age = STORE_REFRESH_SECONDS if max_age is None else max_age
+    path = universe_panel_path(symbols, period, directory)
+
+    def fresh():
+        meta_path = os.path.join(_version_dir(path), 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if time.time() - meta['created_at'] < max_age:
+                return open_panel(path), meta['status']
+        return None
+
+    def rebuild():
+        # A rebuild that finished while this caller waited for the flight is reused
+        loaded = fresh()
+        if loaded is not None:
+            return loaded
+        frames, status = get_stock_data_batch(list(symbols), period)
+        if not frames:
+            return None, status
+        write_panel(path, frames, status=status, period=period)
+        return open_panel(path), status
+
+    loaded = fresh()
+    if loaded is not None:
+        return loaded
+    (panel, status), _ = _rebuilds.do(path, rebuild)
+    return panel, status
@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import re
+import time
+import pandas as pd
+
+# Provider selection: 'live' (Yahoo Finance), 'record' (live + capture to disk) or 'replay' (serve captures)
+PROVIDER_MODE = os.environ.get('STOCK_DATA_PROVIDER', 'live')
+RECORDINGS_PATH = os.environ.get('STOCK_DATA_RECORDINGS', os.path.join('.cache', 'recordings'))
+
+# Message Yahoo uses when throttling, so injected faults follow the real error paths
+RATE_LIMIT_MESSAGE = "Too Many Requests. Rate limited. Try after a while."
+
+class YahooProvider:
+    """Live Yahoo Finance data through yfinance"""
+
+    # Live calls are shaped by the process-wide token bucket
+    shaped = True
+
+    def history(self, symbol, **kwargs):
+        import yfinance as yf
+        return yf.Ticker(symbol).history(**kwargs)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def quote(self, symbol):
+        """Latest trade price and day volume from the lightweight fast_info endpoint"""
+        import yfinance as yf
+        fast = yf.Ticker(symbol).fast_info
+        return {'price': fast.last_price, 'volume': fast.last_volume, 'time': pd.Timestamp.now(tz='UTC')}
+
+    def download(self, symbols, **kwargs):
+        """Grouped download; returns ``(data, errors)`` with per-symbol error messages"""
+        import yfinance as yf
+        data = yf.download(symbols, **kwargs)
+        # yfinance records per-symbol failures here instead of raising
+        errors = getattr(getattr(yf, 'shared', None), '_ERRORS', {}) or {}
+        return data, {symbol: str(error) for symbol, error in errors.items() if symbol in symbols}
+
+def _safe_name(symbol):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+
+def _history_path(directory, symbol, interval):
+    return os.path.join(directory, 'history', f"{_safe_name(symbol)}__{interval}.pkl")
+
+def _info_path(directory, symbol):
+    return os.path.join(directory, 'info', f"{_safe_name(symbol)}.json")
+
+class RecordingProvider:
+    """Wraps another provider and captures every history/info response to disk.
+
+    History is merged per symbol/interval, so a replay can later serve any
+    window that was covered by one of the recorded calls.
+    """
+
+    shaped = True
+
+    def __init__(self, inner=None, directory=RECORDINGS_PATH):
+        self.inner = inner or YahooProvider()
+        self.directory = directory
+
+    def _record_history(self, symbol, interval, hist):
+        if hist is None or hist.empty:
+            return
+        path = _history_path(self.directory, symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            recorded = pd.read_pickle(path)
+            hist = pd.concat([recorded[~recorded.index.isin(hist.index)], hist]).sort_index()
+        hist.to_pickle(path)
+
+    def history(self, symbol, **kwargs):
+        hist = self.inner.history(symbol, **kwargs)
+        self._record_history(symbol, kwargs.get('interval', '1d'), hist)
+        return hist
+
+    def info(self, symbol):
+        info = self.inner.info(symbol)
+        path = _info_path(self.directory, symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(info, f, default=str)
+        return info
+
+    def quote(self, symbol):
+        # Quotes are not recorded; replays derive them from the recorded history
+        return self.inner.quote(symbol)
+
+    def download(self, symbols, **kwargs):
+        data, errors = self.inner.download(symbols, **kwargs)
+        if data is not None and isinstance(data.columns, pd.MultiIndex):
+            for symbol in data.columns.get_level_values(0).unique():
+                self._record_history(symbol, kwargs.get('interval', '1d'), data[symbol].dropna(how='all'))
+        return data, errors
+
+def _align(value, tz):
+    """Timestamp for comparing against an index in timezone ``tz``"""
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        return ts.tz_localize(tz)
+    return ts.tz_convert(tz) if tz is not None else ts.tz_localize(None)
+
+class ReplayProvider:
+    """Serves recorded responses with no network, optionally injecting faults.
+
+    ``latency`` seconds are added to every call; ``empty_rate``,
+    ``incomplete_info_rate`` and ``rate_limit_rate`` are the probabilities of
+    returning an empty frame, an incomplete info dict or raising Yahoo's
+    rate-limit error. ``seed`` makes the injected faults reproducible.
+    """
+
+    # Replays run at full speed; the circuit breaker still sees injected rate limits
+    shaped = False
+
+    def __init__(self, directory=RECORDINGS_PATH, latency=0.0, empty_rate=0.0,
+                 incomplete_info_rate=0.0, rate_limit_rate=0.0, seed=None):
+        self.directory = directory
+        self.latency = latency
+        self.empty_rate = empty_rate
+        self.incomplete_info_rate = incomplete_info_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+
+    def _call(self):
+        """Apply latency and maybe raise an injected rate limit"""
+        if self.latency:
+            time.sleep(self.latency)
+        if self._random.random() < self.rate_limit_rate:
+            raise Exception(RATE_LIMIT_MESSAGE)
+
+    def _window(self, symbol, period=None, start=None, end=None, interval='1d', **kwargs):
+        """Slice the recorded history to the requested window"""
+        path = _history_path(self.directory, symbol, interval)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        hist = pd.read_pickle(path)
+        if start is not None:
+            hist = hist[hist.index >= _align(start, hist.index.tz)]
+        if end is not None:
+            hist = hist[hist.index < _align(end, hist.index.tz)]
+        if start is None and period is not None:
+            from utils import _period_start
+            window_start = _period_start(period)
+            if window_start is not None:
+                hist = hist[hist.index >= _align(window_start, hist.index.tz)]
+        return hist
+
+    def history(self, symbol, **kwargs):
+        self._call()
+        if self._random.random() < self.empty_rate:
+            return pd.DataFrame()
+        return self._window(symbol, **kwargs)
+
+    def info(self, symbol):
+        self._call()
+        path = _info_path(self.directory, symbol)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            info = json.load(f)
+        if self._random.random() < self.incomplete_info_rate:
+            return {'symbol': symbol}
+        return info
+
+    def quote(self, symbol):
+        """The last recorded close, nudged by a small random move, stamped now"""
+        self._call()
+        hist = self._window(symbol)
+        if hist.empty:
+            return None
+        last = hist.iloc[-1]
+        return {
+            'price': float(last['Close']) * (1 + self._random.gauss(0, 0.001)),
+            'volume': int(last.get('Volume', 0)),
+            'time': pd.Timestamp.now(tz='UTC'),
+        }
+
+    def download(self, symbols, **kwargs):
+        self._call()
+        frames, errors = {}, {}
+        for symbol in symbols:
+            if self._random.random() < self.rate_limit_rate:
+                errors[symbol] = RATE_LIMIT_MESSAGE
+                continue
+            hist = pd.DataFrame() if self._random.random() < self.empty_rate else self._window(symbol, **kwargs)
+            if not hist.empty:
+                frames[symbol] = hist
+        data = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        return data, errors
+
+def _provider_from_env():
+    """Build the provider selected by STOCK_DATA_PROVIDER and the REPLAY_* settings"""
+    if PROVIDER_MODE == 'record':
+        return RecordingProvider()
+    if PROVIDER_MODE == 'replay':
+        seed = os.environ.get('REPLAY_SEED')
+        return ReplayProvider(
+            latency=float(os.environ.get('REPLAY_LATENCY', 0)),
+            empty_rate=float(os.environ.get('REPLAY_EMPTY_RATE', 0)),
+            incomplete_info_rate=float(os.environ.get('REPLAY_INCOMPLETE_INFO_RATE', 0)),
+            rate_limit_rate=float(os.environ.get('REPLAY_RATE_LIMIT_RATE', 0)),
+            seed=None if seed is None else int(seed),
+        )
+    return YahooProvider()
+
+_provider = None
+
+def get_provider():
+    """The data provider used by utils for every upstream call"""
+    global _provider
+    if _provider is None:
+        _provider = _provider_from_env()
+    return _provider
+
+def set_provider(provider):
+    """Swap the data provider (e.g. a ReplayProvider in benchmarks or load tests)"""
+    global _provider
+    _provider = provider
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import telemetry
+
+# Outbound Yahoo Finance budget shared by every session in the process
+YAHOO_RATE_PER_SECOND = 2.0
+YAHOO_BURST = 5
+# How long to wait for a token before treating the call as rate limited
+ACQUIRE_TIMEOUT_SECONDS = 2.0
+# How long to stop calling Yahoo after it reports "Too Many Requests"
+BREAKER_COOLDOWN_SECONDS = 600
+
+class RateLimitedError(Exception):
+    """Raised instead of calling upstream while rate limited (message matches Yahoo's)"""
+
+    def __init__(self, message="Too Many Requests"):
+        super().__init__(message)
+
+def is_rate_limit_error(error):
+    """Check whether an exception means Yahoo is throttling us"""
+    error_msg = str(error)
+    return (
+        isinstance(error, RateLimitedError)
+        or type(error).__name__ == 'YFRateLimitError'
+        or "Rate limited" in error_msg
+        or "Too Many Requests" in error_msg
+    )
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` calls per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available right now"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting at most ``timeout`` seconds; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Stops upstream calls for ``cooldown`` seconds after a rate limit.
+
+    Once the cool-down has passed a single trial call is let through
+    (half-open); its success closes the breaker, a failure re-opens it.
+    """
+
+    def __init__(self, cooldown):
+        self.cooldown = cooldown
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+
+    def allow(self):
+        """Check whether a call may go upstream now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """Give back a half-open trial that never reached upstream"""
+        with self._lock:
+            self._trial_running = False
+
+    def trip(self):
+        with self._lock:
+            self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def remaining(self):
+        """Seconds left in the current cool-down (0 when closed)"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+yahoo_limiter = TokenBucket(YAHOO_RATE_PER_SECOND, YAHOO_BURST)
+yahoo_breaker = CircuitBreaker(BREAKER_COOLDOWN_SECONDS)
+
+def call(fn, *args, shaped=True, **kwargs):
+    """Call a Yahoo endpoint through the process-wide limiter and circuit breaker.
+
+    Raises RateLimitedError without calling upstream while the breaker is open
+    or no token frees up in time, and trips the breaker on a rate-limit error.
+    ``shaped=False`` skips the token bucket (e.g. for recorded data) but keeps the breaker.
+    """
+    if not yahoo_breaker.allow():
+        telemetry.increment('upstream_rejected_total', reason='breaker_open')
+        raise RateLimitedError(f"Too Many Requests (cooling down for {yahoo_breaker.remaining():.0f}s)")
+    if shaped:
+        waited = time.perf_counter()
+        acquired = yahoo_limiter.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS)
+        telemetry.increment('limiter_wait_seconds_total', time.perf_counter() - waited)
+        if not acquired:
+            # Not an upstream failure, so hand back a half-open trial instead of tripping
+            yahoo_breaker.release()
+            telemetry.increment('upstream_rejected_total', reason='budget_exhausted')
+            raise RateLimitedError("Too Many Requests (local request budget exhausted)")
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            yahoo_breaker.trip()
+            telemetry.increment('breaker_trips_total')
+        else:
+            yahoo_breaker.record_success()
+        raise
+    yahoo_breaker.record_success()
+    return result
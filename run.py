@@ -2,6 +2,8 @@
 """
 Launcher script for Indian Stock Analysis Dashboard
 Run this file to start the application: python run.py
+Pass --no-warm to skip the background cache warmer.
+Run a headless batch scan with: python run.py scan --help
 """
 
 import subprocess
@@ -28,19 +30,29 @@ def check_dependencies():
 
 def main():
     """Main launcher function"""
+    # Headless batch mode never touches Streamlit
+    if sys.argv[1:2] == ['scan']:
+        from scan import main as scan_main
+        scan_main(sys.argv[2:])
+        return
+
     print("🚀 Starting Indian Stock Analysis Dashboard...")
     
     # Check if dependencies are installed
     if not check_dependencies():
         sys.exit(1)
     
+    # The dashboard process runs the cache warmer itself, so it shares the
+    # server's Yahoo rate budget and circuit breaker
+    env = dict(os.environ, STOCK_WARMER='0' if '--no-warm' in sys.argv else '1')
+    
     # Start Streamlit app
     try:
         subprocess.run([
             sys.executable, '-m', 'streamlit', 'run', 'main.py',
             '--server.port=8501',
             '--server.address=localhost'
-        ])
+        ], env=env)
     except KeyboardInterrupt:
         print("\n👋 Dashboard stopped by user")
     except Exception as e:
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Headless batch scan of a stock universe
+Computes the dashboard indicators and key fundamentals for every symbol without Streamlit.
+Run with: python run.py scan --symbols-file nifty500.txt --period 5y --out results.parquet
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import pandas as pd
+
+import ratelimit
+from indicators import INDICATOR_COLUMNS
+from utils import calculate_metrics, get_stock_data
+
+# Ticker.info fields exported as fundamentals, keyed by output column
+FUNDAMENTAL_FIELDS = {
+    'Market Cap': 'marketCap',
+    'P/E Ratio': 'trailingPE',
+    'EPS (TTM)': 'trailingEps',
+    'Beta': 'beta',
+    'Dividend Yield': 'dividendYield',
+    'Profit Margin': 'profitMargins',
+    'ROE': 'returnOnEquity',
+    'Debt to Equity': 'debtToEquity',
+    'Sector': 'sector',
+}
+SCAN_COLUMNS = ['Symbol', 'Date', 'Close', 'Change %', 'Volume'] + INDICATOR_COLUMNS + list(FUNDAMENTAL_FIELDS)
+
+DEFAULT_WORKERS = 4
+
+def scan_symbol(symbol, period):
+    """Indicators and fundamentals for one symbol; returns ``(symbol, status, row)``"""
+    try:
+        hist, info = get_stock_data(symbol, period)
+    except Exception as e:
+        return symbol, f"ERROR: {e}", None
+    if hist is None:
+        return symbol, info, None
+
+    df = calculate_metrics(hist)
+    last = df.iloc[-1]
+    previous = df['Close'].iloc[-2] if len(df) > 1 else last['Close']
+    row = {
+        'Symbol': symbol,
+        'Date': df.index[-1].strftime('%Y-%m-%d'),
+        'Close': last['Close'],
+        'Change %': (last['Close'] / previous - 1) * 100,
+        'Volume': last['Volume'],
+    }
+    row.update({column: last[column] for column in INDICATOR_COLUMNS})
+    row.update({column: info.get(key) for column, key in FUNDAMENTAL_FIELDS.items()})
+    return symbol, "OK", row
+
+def _init_worker(workers):
+    """Split the Yahoo request budget between worker processes"""
+    ratelimit.yahoo_limiter = ratelimit.TokenBucket(
+        ratelimit.YAHOO_RATE_PER_SECOND / workers,
+        max(1, ratelimit.YAHOO_BURST // workers)
+    )
+
+def load_checkpoint(path):
+    """Rows already written to a checkpoint file, dropping a line cut off by an interruption"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return pd.DataFrame(columns=SCAN_COLUMNS)
+    done = pd.read_csv(path, on_bad_lines='skip')
+    done = done.dropna(subset=['Symbol', 'Date']).drop_duplicates('Symbol', keep='last')
+    done = done.reindex(columns=SCAN_COLUMNS)
+    # Rewrite so appended rows always start on a fresh line, in the column order they use
+    done.to_csv(path, index=False)
+    return done
+
+def _append_row(f, row):
+    pd.DataFrame([row], columns=SCAN_COLUMNS).to_csv(f, header=f.tell() == 0, index=False)
+    f.flush()
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def scan(symbols, period='1y', out='results.csv', workers=DEFAULT_WORKERS, checkpoint=None, restart=False):
+    """Scan ``symbols`` in a process pool, streaming each finished row to disk.
+
+    Rows are appended to a CSV checkpoint as soon as a symbol finishes, so an
+    interrupted scan resumes where it stopped, and the output is written from
+    it at the end. The default checkpoint sits next to the output and is keyed
+    by period and date, so it never carries over to another period or day's
+    run; it is removed once every symbol has succeeded and kept otherwise, so
+    a re-run retries only the failures. ``restart`` discards an existing
+    checkpoint. Returns the per-symbol status map for this run.
+    """
+    parquet = out.lower().endswith('.parquet')
+    if parquet and not _parquet_available():
+        out = os.path.splitext(out)[0] + '.csv'
+        parquet = False
+        print(f"pyarrow is not installed, writing CSV to {out} instead")
+    checkpoint = checkpoint or f"{out}.{period}.{date.today():%Y%m%d}.partial.csv"
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    done = set(load_checkpoint(checkpoint)['Symbol'])
+    pending = [symbol for symbol in symbols if symbol not in done]
+    if done:
+        print(f"Resuming: {len(done)} stocks already in {checkpoint}")
+    print(f"🔎 Scanning {len(pending)} stocks ({period}) with {workers} workers...")
+
+    status = {}
+    with open(checkpoint, 'a', newline='') as f, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+        futures = [pool.submit(scan_symbol, symbol, period) for symbol in pending]
+        for i, future in enumerate(as_completed(futures), 1):
+            symbol, code, row = future.result()
+            status[symbol] = code
+            if row is not None:
+                _append_row(f, row)
+            else:
+                print(f"{symbol}: {code}")
+            if i % 25 == 0:
+                print(f"  {i}/{len(pending)} done")
+
+    results = load_checkpoint(checkpoint)
+    if parquet:
+        results['Date'] = pd.to_datetime(results['Date'])
+        results.to_parquet(out, index=False)
+    else:
+        results.to_csv(out, index=False)
+
+    failed = [symbol for symbol, code in status.items() if code != "OK"]
+    if not failed:
+        os.remove(checkpoint)
+    print(f"✅ Scanned {len(status) - len(failed)} of {len(pending)} stocks into {out}")
+    if failed:
+        print(f"{len(failed)} failed (re-run to retry): {', '.join(sorted(failed))}")
+    return status
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(prog='run.py scan', description="Scan a stock universe without the UI")
+    parser.add_argument('--symbols-file', help="Universe file (defaults to the built-in stock list)")
+    parser.add_argument('--period', default='1y', help="History period, e.g. 1y or 5y (default: 1y)")
+    parser.add_argument('--out', default='results.csv', help="Output .parquet or .csv file (default: results.csv)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker processes (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--checkpoint', help="Checkpoint file to resume from (default: derived from --out, --period and the date)")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    from screener import load_universe
+    symbols = load_universe(args.symbols_file)
+
+    try:
+        scan(symbols, args.period, args.out, args.workers, args.checkpoint, args.restart)
+    except KeyboardInterrupt:
+        print("\n👋 Scan interrupted, re-run the same command to resume")
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
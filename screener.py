@@ -0,0 +1,85 @@
+import operator
+import os
+import pandas as pd
+from indicators import INDICATOR_COLUMNS, compute_indicator_panel
+from utils import DEFAULT_STOCKS, get_stock_data_batch
+
+# Comparison operators available to screener rules
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Columns of the screener snapshot that rules can refer to
+SCREEN_COLUMNS = ['Close', 'Change %', 'SMA_20', 'SMA_50', 'RSI', 'MACD', 'Signal_Line', 'BB_upper', 'BB_lower']
+
+def load_universe(path=None):
+    """Load screener symbols from a file, or the default universe.
+
+    Accepts a plain list (one symbol per line, '#' comments allowed) or a CSV with
+    a 'Symbol' column such as the NSE index constituent lists, where bare NSE
+    symbols get the '.NS' suffix.
+    """
+    if path is None:
+        return list(DEFAULT_STOCKS)
+
+    if os.path.splitext(path)[1].lower() == '.csv':
+        symbols = pd.read_csv(path)['Symbol'].dropna().astype(str).str.strip().tolist()
+    else:
+        with open(path) as f:
+            symbols = [line.split('#')[0].strip() for line in f]
+    symbols = [s if '.' in s else f"{s}.NS" for s in symbols if s]
+    return list(dict.fromkeys(symbols))
+
+def build_price_panel(symbols, period='1y'):
+    """Load closes for many symbols into one date x symbol panel.
+
+    Returns ``(panel, status)`` where ``status`` is the per-symbol map from
+    get_stock_data_batch. Gaps inside a symbol's history are forward filled.
+    """
+    frames, status = get_stock_data_batch(symbols, period)
+    if not frames:
+        return pd.DataFrame(), status
+    panel = pd.concat({symbol: frame['Close'] for symbol, frame in frames.items()}, axis=1).sort_index()
+    return panel.ffill(limit_area='inside'), status
+
+def panel_rsi(close, period=14):
+    """calculate_rsi for every column of a close panel at once"""
+    # Like calculate_rsi, a symbol's first change counts as zero; rows before its first close stay empty
+    delta = close.diff()
+    gain = delta.clip(lower=0).fillna(0).where(close.notna()).rolling(window=period).mean()
+    loss = (-delta).clip(lower=0).fillna(0).where(close.notna()).rolling(window=period).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+def compute_panel_indicators(close):
+    """Compute the calculate_metrics indicators for every column of a close panel at once"""
+    values = compute_indicator_panel(close.to_numpy(dtype=float))
+    return {column: pd.DataFrame(values[i], index=close.index, columns=close.columns)
+            for i, column in enumerate(INDICATOR_COLUMNS)}
+
+def screen_snapshot(close, indicators):
+    """Latest close, daily change and indicator values per symbol"""
+    snapshot = pd.DataFrame({
+        'Close': close.iloc[-1],
+        'Change %': close.pct_change(fill_method=None).iloc[-1] * 100,
+    })
+    for column in SCREEN_COLUMNS[2:]:
+        snapshot[column] = indicators[column].iloc[-1]
+    snapshot.index.name = 'Symbol'
+    return snapshot
+
+def apply_rules(snapshot, rules):
+    """Filter a snapshot with ``(column, operator, value)`` rules combined with AND.
+
+    ``value`` is either a number or the name of another snapshot column, so
+    rules like ``('Close', '>', 'SMA_50')`` compare columns element-wise.
+    """
+    mask = pd.Series(True, index=snapshot.index)
+    for column, op, value in rules:
+        right = snapshot[value] if isinstance(value, str) and value in snapshot.columns else float(value)
+        mask &= OPERATORS[op](snapshot[column], right)
+    return snapshot[mask]
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import telemetry
+import utils
+
+# Total time a page waits for data before falling through to the next tier, in seconds
+LATENCY_BUDGET_SECONDS = float(os.environ.get('STOCK_LATENCY_BUDGET', 6.0))
+# Deadline for the live tier within the overall budget, in seconds; the store tiers are local reads and run inline
+LIVE_DEADLINE_SECONDS = 4.0
+# Live fetches allowed in flight at once, counting ones abandoned at their deadline
+LIVE_FETCH_WORKERS = 8
+# Tiers in the order they are tried
+TIERS = ['memory', 'disk', 'live', 'last_known_good', 'sample']
+# Degraded results are kept in memory briefly, so reruns don't wait on a failing upstream again
+DEGRADED_TTL_SECONDS = 60
+
+# Live fetches run here so a deadline can abandon them; an abandoned fetch keeps running
+# and fills the store, and later requests join it through get_stock_data's single flight
+_live_executor = ThreadPoolExecutor(max_workers=LIVE_FETCH_WORKERS, thread_name_prefix='data-source')
+_live_slots = threading.BoundedSemaphore(LIVE_FETCH_WORKERS)
+
+def _fetch_live(fn, timeout):
+    """Run a live fetch against a deadline; returns ``(result, failure)`` with failure None, "BUSY", "TIMEOUT" or "ERROR: ..."
+
+    A fetch holds one of LIVE_FETCH_WORKERS slots until it really finishes, so
+    slow upstream calls abandoned at their deadline can't pile up: once every
+    slot is taken, new requests go straight to the stored tiers.
+    """
+    if not _live_slots.acquire(blocking=False):
+        return None, "BUSY"
+
+    def run():
+        try:
+            return fn()
+        finally:
+            _live_slots.release()
+
+    future = _live_executor.submit(run)
+    try:
+        return future.result(timeout=max(timeout, 0)), None
+    except TimeoutError:
+        return None, "TIMEOUT"
+    except Exception as e:
+        return None, f"ERROR: {e}"
+
+def load_stock_data(symbol, period='1y', start_date=None, end_date=None, interval='1d', cache=None):
+    """Load history and info through the fallback chain memory -> disk -> live -> last-known-good -> sample.
+
+    Returns ``(hist, info, provenance)``. ``provenance`` says which tier answered
+    (``source``), which tier the data originally came from (``origin``, which
+    differs from ``source`` only for memory hits) and, for fallbacks, why the
+    live tier did not answer (``reason``: a get_stock_data error code or
+    "TIMEOUT" or "BUSY"). ``cache`` is an LRUCache for the memory tier. When no
+    tier can answer, ``hist`` is None and ``info`` is the error code. The live
+    tier runs against a deadline, so the call returns within about
+    LATENCY_BUDGET_SECONDS whatever upstream is doing.
+    """
+    if not utils.interval_supported(interval, period, start_date):
+        return None, f"ERROR: {interval} bars are not available for period {period}", {'source': None}
+
+    key = ('source', symbol, period, start_date, end_date, interval)
+    started = time.monotonic()
+    with telemetry.span('load_stock_data', symbol=symbol, period=period) as fields:
+        hist, info, provenance = _load(symbol, period, start_date, end_date, interval, cache, key, started)
+        fields.update(source=provenance['source'], origin=provenance.get('origin'))
+        if provenance.get('reason'):
+            fields['reason'] = provenance['reason']
+    telemetry.increment('data_source_total', source=provenance['source'] or 'none')
+    return hist, info, provenance
+
+def _load(symbol, period, start_date, end_date, interval, cache, key, started):
+    """Body of load_stock_data"""
+    def remaining():
+        return min(LIVE_DEADLINE_SECONDS, LATENCY_BUDGET_SECONDS - (time.monotonic() - started))
+
+    def answer(source, hist, info, reason=None):
+        provenance = {'source': source, 'origin': source, 'as_of': hist.index[-1]}
+        if reason:
+            provenance['reason'] = reason
+        if cache is not None:
+            cache.put(key, (hist, info, provenance),
+                      ttl=DEGRADED_TTL_SECONDS if reason else utils.STORE_REFRESH_SECONDS)
+        return hist.copy(), info, provenance
+
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            hist, info, provenance = cached
+            return hist.copy(), info, dict(provenance, source='memory')
+
+    stored = utils.get_stored_data(symbol, period, start_date, end_date, interval,
+                                   max_age=utils.STORE_REFRESH_SECONDS)
+    if stored is not None:
+        return answer('disk', *stored)
+
+    # Without the store fallback a rate limit comes back as RATE_LIMITED, and the
+    # stored bars are then served (and labelled) by the last-known-good tier
+    live, failure = _fetch_live(
+        lambda: utils.get_stock_data(symbol, period, start_date, end_date, interval=interval,
+                                     store_fallback=False),
+        remaining()
+    )
+    hist, info = live if failure is None else (None, failure)
+    if hist is not None:
+        return answer('live', hist, info)
+    reason = info
+    print(f"Live data unavailable for {symbol} ({reason}), falling back")
+
+    stored = utils.get_stored_data(symbol, period, start_date, end_date, interval, partial=True)
+    if stored is not None:
+        return answer('last_known_good', *stored, reason=reason)
+
+    if reason == "NO_DATA":
+        # The symbol itself is unknown upstream; made-up prices would only mislead
+        return None, reason, {'source': None, 'reason': reason}
+    sample_period = period if period != 'custom' else '1y'
+    return answer('sample', *utils.get_sample_stock_data(symbol, sample_period), reason=reason)
@@ -0,0 +1,235 @@
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# Local on-disk OHLCV store so reruns only fetch bars newer than what we already hold
+STORE_PATH = os.environ.get('STOCK_STORE_PATH', os.path.join('.cache', 'ohlcv.sqlite'))
+
+# Half-life of the recent-access score used to find hot symbols
+ACCESS_HALF_LIFE_SECONDS = 24 * 3600
+
+# Columns persisted for every bar (yfinance history() output)
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    dividends REAL, splits REAL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    tz TEXT,
+    covered_from INTEGER,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (symbol, interval)
+);
+
+CREATE TABLE IF NOT EXISTS access (
+    symbol TEXT PRIMARY KEY,
+    score REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS info (
+    symbol TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+@contextmanager
+def _connect():
+    """Open a transaction on the store, creating the schema on first use"""
+    directory = os.path.dirname(STORE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, timeout=30)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _to_utc_ns(index):
+    """Convert a DatetimeIndex to UTC nanosecond integers"""
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+def get_coverage(symbol, interval):
+    """Return the stored coverage record for a symbol/interval, or None"""
+    with _connect() as conn:
+        row = conn.execute(
+            'SELECT tz, covered_from, refreshed_at FROM coverage WHERE symbol = ? AND interval = ?',
+            (symbol, interval)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        'tz': row[0],
+        # None means the full available history ('max') is stored
+        'covered_from': None if row[1] is None else pd.Timestamp(row[1], tz='UTC'),
+        'refreshed_at': row[2],
+    }
+
+def covers(coverage, start):
+    """Check whether stored coverage reaches back to ``start`` (None means 'max')"""
+    if coverage is None:
+        return False
+    if coverage['covered_from'] is None:
+        return True
+    if start is None:
+        return False
+    return start >= coverage['covered_from']
+
+def write_history(symbol, interval, hist, covered_from=False, replace=False):
+    """Upsert bars for a symbol/interval and update its coverage record.
+
+    ``covered_from`` is the UTC start of the window the bars were fetched for
+    (None for 'max'); leave it as False to keep the existing coverage start.
+    ``replace`` drops previously stored bars first, e.g. after a corporate
+    action re-adjusted the whole history.
+    """
+    frame = hist.reindex(columns=BAR_COLUMNS).fillna({'Dividends': 0, 'Stock Splits': 0})
+    tz = str(hist.index.tz) if hist.index.tz is not None else None
+    rows = list(zip(
+        [symbol] * len(frame),
+        [interval] * len(frame),
+        _to_utc_ns(frame.index).tolist(),
+        *[frame[column].astype(float).tolist() for column in BAR_COLUMNS]
+    ))
+
+    with _connect() as conn:
+        existing = conn.execute(
+            'SELECT covered_from FROM coverage WHERE symbol = ? AND interval = ?',
+            (symbol, interval)
+        ).fetchone()
+
+        if covered_from is False:
+            new_from = existing[0] if existing else (int(rows[0][2]) if rows else None)
+        else:
+            new_from = None if covered_from is None else covered_from.value
+            # Never shrink coverage we already hold
+            if existing and not replace:
+                if existing[0] is None or new_from is None:
+                    new_from = None
+                else:
+                    new_from = min(existing[0], new_from)
+
+        if replace:
+            conn.execute('DELETE FROM bars WHERE symbol = ? AND interval = ?', (symbol, interval))
+        conn.executemany(
+            'INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        conn.execute(
+            'INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)',
+            (symbol, interval, tz, new_from, time.time())
+        )
+
+def touch(symbol, interval):
+    """Mark a symbol/interval as freshly refreshed without writing bars"""
+    with _connect() as conn:
+        conn.execute(
+            'UPDATE coverage SET refreshed_at = ? WHERE symbol = ? AND interval = ?',
+            (time.time(), symbol, interval)
+        )
+
+def last_timestamp(symbol, interval):
+    """Return the timestamp of the newest stored bar, or None"""
+    with _connect() as conn:
+        row = conn.execute(
+            'SELECT MAX(ts) FROM bars WHERE symbol = ? AND interval = ?',
+            (symbol, interval)
+        ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    coverage = get_coverage(symbol, interval)
+    ts = pd.Timestamp(row[0], tz='UTC')
+    return ts.tz_convert(coverage['tz']) if coverage and coverage['tz'] else ts
+
+def read_history(symbol, interval, start=None, end=None):
+    """Read stored bars as a yfinance-shaped DataFrame, optionally windowed"""
+    query = ('SELECT ts, open, high, low, close, volume, dividends, splits '
+             'FROM bars WHERE symbol = ? AND interval = ?')
+    params = [symbol, interval]
+    if start is not None:
+        query += ' AND ts >= ?'
+        params.append(start.value)
+    if end is not None:
+        query += ' AND ts < ?'
+        params.append(end.value)
+    query += ' ORDER BY ts'
+
+    with _connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+    coverage = get_coverage(symbol, interval)
+
+    index = pd.DatetimeIndex(pd.to_datetime([row[0] for row in rows], utc=True), name='Date')
+    if coverage and coverage['tz']:
+        index = index.tz_convert(coverage['tz'])
+    df = pd.DataFrame([row[1:] for row in rows], index=index, columns=BAR_COLUMNS, dtype=float)
+    df['Volume'] = df['Volume'].fillna(0).astype('int64')
+    return df
+
+def read_info(symbol):
+    """Return the stored ``(info, fetched_at)`` fundamentals for a symbol, or None"""
+    with _connect() as conn:
+        row = conn.execute(
+            'SELECT payload, fetched_at FROM info WHERE symbol = ?', (symbol,)
+        ).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0]), row[1]
+
+def write_info(symbol, info, fetched_at=None):
+    """Store the fundamentals dict for a symbol"""
+    with _connect() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO info VALUES (?, ?, ?)',
+            (symbol, json.dumps(info, default=str), fetched_at or time.time())
+        )
+
+def _decayed(score, last_access, now):
+    """Access score decayed to ``now``"""
+    return score * math.exp(-math.log(2) * (now - last_access) / ACCESS_HALF_LIFE_SECONDS)
+
+def record_access(symbol):
+    """Bump a symbol's exponentially decaying recent-access score"""
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute('SELECT score, last_access FROM access WHERE symbol = ?', (symbol,)).fetchone()
+        score = 1.0 if row is None else _decayed(row[0], row[1], now) + 1.0
+        conn.execute('INSERT OR REPLACE INTO access VALUES (?, ?, ?)', (symbol, score, now))
+
+def access_scores():
+    """Current recent-access score per symbol"""
+    now = time.time()
+    with _connect() as conn:
+        rows = conn.execute('SELECT symbol, score, last_access FROM access').fetchall()
+    return {symbol: _decayed(score, last_access, now) for symbol, score, last_access in rows}
+
+def clear(symbol=None):
+    """Remove everything stored, for one symbol or all of them"""
+    with _connect() as conn:
+        if symbol is None:
+            conn.execute('DELETE FROM bars')
+            conn.execute('DELETE FROM coverage')
+            conn.execute('DELETE FROM info')
+            conn.execute('DELETE FROM access')
+        else:
+            conn.execute('DELETE FROM bars WHERE symbol = ?', (symbol,))
+            conn.execute('DELETE FROM coverage WHERE symbol = ?', (symbol,))
+            conn.execute('DELETE FROM info WHERE symbol = ?', (symbol,))
+            conn.execute('DELETE FROM access WHERE symbol = ?', (symbol,))
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local Prometheus endpoint; set STOCK_METRICS_PORT=0 to disable it
+METRICS_HOST = os.environ.get('STOCK_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('STOCK_METRICS_PORT', 9108))
+
+# Histogram buckets for stage durations, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Structured JSON log lines go to stderr unless the host app configures this logger
+logger = logging.getLogger('stock_dashboard.telemetry')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(os.environ.get('STOCK_TELEMETRY_LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+# Most recent spans, newest last, for the diagnostics panel
+recent_spans = deque(maxlen=200)
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def increment(name, amount=1, **labels):
+    """Add to a counter"""
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    """Record a value in a histogram"""
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.setdefault(key, {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+def log_event(event, **fields):
+    """Emit one structured JSON log line"""
+    logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+@contextmanager
+def span(stage, **labels):
+    """Time a stage, recording it in the stage_seconds histogram, the JSON log and recent_spans.
+
+    Yields a dict that the block can add fields to (e.g. retries or cache result).
+    """
+    fields = {}
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield fields
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        observe('stage_seconds', duration, stage=stage)
+        record = {'stage': stage, 'duration_ms': round(duration * 1000, 2), 'status': status, **labels, **fields}
+        recent_spans.append(record)
+        log_event('span', **record)
+
+def counters():
+    """Snapshot of counters as ``{(name, labels): value}``"""
+    with _lock:
+        return dict(_counters)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+def render_prometheus():
+    """Counters and histograms in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for name in sorted({name for name, _ in _counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter, labels), value in sorted(_counters.items()):
+                if counter == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in _histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (histogram, labels), data in sorted(_histograms.items()):
+                if histogram != name:
+                    continue
+                for bound, count in zip(DURATION_BUCKETS, data['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {data['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {data['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {data['count']}")
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_attempted = False
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics from a daemon thread, once per process; returns False if unavailable"""
+    global _server, _server_attempted
+    with _lock:
+        if _server_attempted:
+            return _server is not None
+        _server_attempted = True
+        if not port:
+            return False
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return False
+    threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-server').start()
+    return True
@@ -0,0 +1,101 @@
+"""Regression tests for refreshing stored history around corporate actions"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import providers
+import store
+import utils
+
+
+def bars(start, periods, dividend_on=None):
+    """Daily OHLCV bars in exchange time, optionally with a dividend on one date"""
+    index = pd.date_range(start, periods=periods, freq='B', tz='Asia/Kolkata')
+    close = np.linspace(100, 120, periods)
+    frame = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                          'Volume': 1000.0, 'Dividends': 0.0, 'Stock Splits': 0.0}, index=index)
+    if dividend_on is not None:
+        frame.loc[dividend_on, 'Dividends'] = 5.0
+    return frame
+
+
+class ScriptedProvider:
+    """Answers history() calls from a queue of frames"""
+    shaped = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def history(self, symbol, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'STORE_PATH', str(tmp_path / 'ohlcv.sqlite'))
+    monkeypatch.setattr(utils, 'STORE_REFRESH_SECONDS', 0)
+    utils._history_frames.clear()
+    yield
+    utils._history_frames.clear()
+    providers.set_provider(None)
+
+
+def sync(provider):
+    providers.set_provider(provider)
+    utils._history_frames.clear()
+    utils._sync_history('TEST.NS', '1d', None)
+    utils._history_frames.clear()
+    return store.read_history('TEST.NS', '1d')
+
+
+def seed(frame):
+    store.write_history('TEST.NS', '1d', frame, covered_from=None)
+
+
+@pytest.mark.parametrize('empty', [
+    pd.DataFrame(),
+    bars('2024-01-01', 0),
+], ids=['range-index', 'datetime-index'])
+def test_empty_rebuild_keeps_stored_bars(empty):
+    history = bars('2024-01-01', 60)
+    seed(history)
+    delta = bars(history.index[-1], 3, dividend_on=history.index[-1] + pd.offsets.BDay(1))
+
+    held = sync(ScriptedProvider(delta, empty))
+    assert len(held) == len(history)
+
+    # The symbol still refreshes normally afterwards
+    held = sync(ScriptedProvider(bars(history.index[-1], 2)))
+    assert len(held) == len(history) + 1
+
+
+def test_coverage_without_bars_falls_back_to_full_fetch():
+    seed(bars('2024-01-01', 60))
+    with store._connect() as conn:
+        conn.execute('DELETE FROM bars')
+
+    provider = ScriptedProvider(bars('2024-01-01', 60))
+    held = sync(provider)
+    assert len(held) == 60
+    assert 'start' not in provider.calls[0]
+
+
+def test_dividend_on_refetched_last_bar_triggers_rebuild():
+    history = bars('2024-01-01', 60)
+    seed(history)
+    # Yahoo flags the last stored bar as the ex-date only on the re-fetch
+    delta = bars(history.index[-1], 1, dividend_on=history.index[-1])
+    rebuilt = bars('2024-01-01', 60, dividend_on=history.index[-1]) * [0.9, 0.9, 0.9, 0.9, 1, 1, 1]
+
+    provider = ScriptedProvider(delta, rebuilt)
+    held = sync(provider)
+    assert len(provider.calls) == 2
+    assert held['Close'].iloc[0] == pytest.approx(rebuilt['Close'].iloc[0])
+
+    # Once stored, the same action does not trigger another rebuild
+    provider = ScriptedProvider(bars(history.index[-1], 1, dividend_on=history.index[-1]))
+    sync(provider)
+    assert len(provider.calls) == 1
@@ -0,0 +1,23 @@
+# Indian Fortune 500 stocks
+DEFAULT_STOCKS = [
+    'RELIANCE.NS',    # Reliance Industries
+    'TCS.NS',         # Tata Consultancy Services
+    'HDFCBANK.NS',    # HDFC Bank
+    'INFY.NS',        # Infosys
+    'ICICIBANK.NS',   # ICICI Bank
+    'HINDUNILVR.NS',  # Hindustan Unilever
+    'SBIN.NS',        # State Bank of India
+    'BHARTIARTL.NS',  # Bharti Airtel
+    'ITC.NS',         # ITC Limited
+    'KOTAKBANK.NS',   # Kotak Mahindra Bank
+    'LT.NS',          # Larsen & Toubro
+    'BAJFINANCE.NS',  # Bajaj Finance
+    'ASIANPAINT.NS',  # Asian Paints
+    'MARUTI.NS',      # Maruti Suzuki
+    'WIPRO.NS',       # Wipro
+    'TITAN.NS',       # Titan Company
+    'ADANIENT.NS',    # Adani Enterprises
+    'ULTRACEMCO.NS',  # UltraTech Cement
+    'SUNPHARMA.NS',   # Sun Pharma
+    'AXISBANK.NS'     # Axis Bank
+]
@@ -1,11 +1,68 @@
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+import re
+import threading
+import time
+import zlib
+import providers
+import ratelimit
+import store
+import telemetry
+from universe import DEFAULT_STOCKS
+from caching import LRUCache, SingleFlight
 # Removed trafilatura dependency - using simplified news
 from datetime import datetime, timedelta
 
+# Minimum seconds between upstream refreshes of a stored symbol/interval
+STORE_REFRESH_SECONDS = 300
+
+# Fundamentals change at most daily, so Ticker.info is cached separately from history
+INFO_TTL_SECONDS = 12 * 3600
+
+_info_cache = {}
+_info_refreshing = set()
+_info_lock = threading.Lock()
+
+# Concurrent sessions asking for the same data share one upstream fetch
+_inflight = SingleFlight()
+
+# Stored histories kept in memory per symbol/interval, so windows are sliced without a store read
+HISTORY_FRAMES_CACHED = 64
+_history_frames = LRUCache(maxsize=HISTORY_FRAMES_CACHED)
+
+# Timezone assumed for custom date ranges before a symbol's bars are stored
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+
+_PERIOD_PATTERN = re.compile(r'^(\d+)(d|wk|mo|y)$')
+
+# Bar sizes get_stock_data can return, as pandas resample rules
+INTERVAL_RULES = {
+    '1m': '1min',
+    '5m': '5min',
+    '15m': '15min',
+    '1h': '1h',
+    '1d': '1D',
+    '1wk': 'W-MON',
+}
+# Intervals kept in the store, finest first; coarser bars are resampled from them.
+# Yahoo only serves intraday bars for a limited lookback (days).
+BASE_INTERVAL_LOOKBACK_DAYS = {
+    '1m': 7,
+    '5m': 60,
+    '1h': 730,
+    '1d': None,
+}
+# How each OHLCV column combines when bars are merged
+_OHLCV_AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'sum',
+}
+
 def get_sample_stock_data(symbol, period='1y'):
     """Generate realistic sample data when Yahoo Finance is unavailable"""
     # Generate date range based on period
@@ -26,7 +83,7 @@ def get_sample_stock_data(symbol, period='1y'):
         start_date = end_date - timedelta(days=365)
     
     # Generate realistic sample data
-    dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    dates = pd.date_range(start=start_date, end=end_date, freq='D', normalize=True)
     dates = dates[dates.weekday < 5]  # Only weekdays
     
     # Base prices for different stocks
@@ -56,33 +113,25 @@ def get_sample_stock_data(symbol, period='1y'):
     base_price = base_prices.get(symbol, 1000)
     
     # Generate price data with realistic volatility
-    np.random.seed(hash(symbol) % 2**32)  # Consistent randomness per stock
-    returns = np.random.normal(0.0005, 0.02, len(dates))  # Small daily returns
-    
-    prices = [base_price]
-    for i in range(1, len(dates)):
-        new_price = prices[-1] * (1 + returns[i])
-        prices.append(max(new_price, base_price * 0.5))  # Prevent negative prices
+    # Seed from a stable checksum (hash() is salted per process) so every worker builds the same series
+    rng = np.random.default_rng(zlib.crc32(symbol.encode('utf-8')))
+    returns = rng.normal(0.0005, 0.02, len(dates))  # Small daily returns
+    returns[0] = 0
+    prices = np.maximum(base_price * np.cumprod(1 + returns), base_price * 0.5)  # Prevent negative prices
     
     # Create OHLC data
-    data = []
-    for i, (date, close) in enumerate(zip(dates, prices)):
-        high = close * (1 + abs(np.random.normal(0, 0.01)))
-        low = close * (1 - abs(np.random.normal(0, 0.01)))
-        open_price = close * (1 + np.random.normal(0, 0.005))
-        volume = int(np.random.normal(1000000, 300000))
-        
-        data.append({
-            'Date': date,
-            'Open': open_price,
-            'High': max(open_price, high, close),
-            'Low': min(open_price, low, close),
-            'Close': close,
-            'Volume': max(volume, 100000)
-        })
+    high = prices * (1 + np.abs(rng.normal(0, 0.01, len(dates))))
+    low = prices * (1 - np.abs(rng.normal(0, 0.01, len(dates))))
+    open_prices = prices * (1 + rng.normal(0, 0.005, len(dates)))
+    volume = rng.normal(1000000, 300000, len(dates)).astype(np.int64)
     
-    df = pd.DataFrame(data)
-    df.set_index('Date', inplace=True)
+    df = pd.DataFrame({
+        'Open': open_prices,
+        'High': np.maximum.reduce([open_prices, high, prices]),
+        'Low': np.minimum.reduce([open_prices, low, prices]),
+        'Close': prices,
+        'Volume': np.maximum(volume, 100000)
+    }, index=pd.DatetimeIndex(dates, name='Date'))
     
     # Sample stock info
     current_price = prices[-1]
@@ -91,22 +140,22 @@ def get_sample_stock_data(symbol, period='1y'):
     sample_info = {
         'currentPrice': current_price,
         'regularMarketChangePercent': change_percent,
-        'fiftyTwoWeekHigh': max(prices),
-        'fiftyTwoWeekLow': min(prices),
+        'fiftyTwoWeekHigh': prices.max(),
+        'fiftyTwoWeekLow': prices.min(),
         'marketCap': int(current_price * 1000000000),
         'volume': df['Volume'].iloc[-1],
         'averageVolume': int(df['Volume'].mean()),
-        'trailingPE': round(np.random.uniform(15, 35), 2),
-        'forwardPE': round(np.random.uniform(12, 30), 2),
-        'priceToBook': round(np.random.uniform(1.5, 4), 2),
-        'profitMargins': round(np.random.uniform(0.05, 0.25), 4),
-        'operatingMargins': round(np.random.uniform(0.08, 0.30), 4),
-        'returnOnEquity': round(np.random.uniform(0.10, 0.25), 4),
-        'debtToEquity': round(np.random.uniform(0.2, 1.5), 2),
-        'currentRatio': round(np.random.uniform(1.0, 2.5), 2),
-        'beta': round(np.random.uniform(0.8, 1.5), 2),
-        'dividendYield': round(np.random.uniform(0.01, 0.04), 4),
-        'trailingEps': round(current_price / np.random.uniform(15, 35), 2),
+        'trailingPE': round(rng.uniform(15, 35), 2),
+        'forwardPE': round(rng.uniform(12, 30), 2),
+        'priceToBook': round(rng.uniform(1.5, 4), 2),
+        'profitMargins': round(rng.uniform(0.05, 0.25), 4),
+        'operatingMargins': round(rng.uniform(0.08, 0.30), 4),
+        'returnOnEquity': round(rng.uniform(0.10, 0.25), 4),
+        'debtToEquity': round(rng.uniform(0.2, 1.5), 2),
+        'currentRatio': round(rng.uniform(1.0, 2.5), 2),
+        'beta': round(rng.uniform(0.8, 1.5), 2),
+        'dividendYield': round(rng.uniform(0.01, 0.04), 4),
+        'trailingEps': round(current_price / rng.uniform(15, 35), 2),
         'totalRevenue': int(current_price * 500000000),
         'exchange': 'NSE',
         'currency': 'INR',
@@ -116,28 +165,483 @@ def get_sample_stock_data(symbol, period='1y'):
         'website': 'https://example.com',
         'city': 'Mumbai',
         'country': 'India',
-        'fullTimeEmployees': int(np.random.uniform(50000, 500000)),
+        'fullTimeEmployees': int(rng.uniform(50000, 500000)),
         'longBusinessSummary': f"This is sample data for {symbol} due to Yahoo Finance rate limiting."
     }
     
     return df, sample_info
 
-def get_stock_data(symbol, period='1y', start_date=None, end_date=None, retry_count=3):
-    """Fetch stock data using yfinance with retry logic"""
-    import time
-    
+def _period_start(period, now=None):
+    """Return the UTC start of a yfinance period window, or None for 'max'"""
+    now = now or pd.Timestamp.now(tz='UTC')
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    match = _PERIOD_PATTERN.match(period)
+    if not match:
+        return now - pd.DateOffset(years=1)
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        # Day periods count trading sessions; the extra day absorbs exchange timezone offsets
+        return now.normalize() - pd.offsets.BDay(count) - pd.Timedelta(days=1)
+    if unit == 'wk':
+        return now - pd.DateOffset(weeks=count)
+    if unit == 'mo':
+        return now - pd.DateOffset(months=count)
+    return now - pd.DateOffset(years=count)
+
+def resample_ohlcv(df, interval):
+    """Merge OHLCV bars into coarser ``interval`` bars, dropping bins without trades.
+
+    Intraday bins are aligned to the session open (NSE hourly bars start at
+    09:15) and weekly bars are labelled with their Monday, as Yahoo does.
+    """
+    if df.empty:
+        return df
+    rule = INTERVAL_RULES[interval]
+    aggregation = {column: how for column, how in _OHLCV_AGGREGATION.items() if column in df.columns}
+    if interval == '1wk':
+        bars = df.resample(rule, label='left', closed='left').agg(aggregation)
+    elif interval == '1d':
+        bars = df.resample(rule).agg(aggregation)
+    else:
+        session_open = df.index[0] - df.index[0].normalize()
+        bars = df.resample(rule, offset=session_open % pd.Timedelta(rule)).agg(aggregation)
+    return bars.dropna(subset=['Close'])
+
+def _base_interval(interval, window_start):
+    """Finest stored interval that ``interval`` bars from ``window_start`` can be built from, or None"""
+    if interval not in INTERVAL_RULES:
+        return None
+    if interval in ('1d', '1wk'):
+        # Yahoo's daily bars go back furthest, so daily and weekly always come from them
+        return '1d'
+    if window_start is None:
+        return None
+    step = pd.Timedelta(INTERVAL_RULES[interval])
+    for base, lookback in BASE_INTERVAL_LOOKBACK_DAYS.items():
+        if lookback is None or step % pd.Timedelta(INTERVAL_RULES[base]):
+            continue
+        if window_start >= pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=lookback):
+            return base
+    return None
+
+def _request_start(period, start_date=None):
+    """UTC start of the window a get_stock_data call asks for (None for 'max')"""
+    if period == 'custom' and start_date:
+        return pd.Timestamp(start_date, tz='UTC')
+    return _period_start(period)
+
+def _custom_bounds(start_date, end_date, tz):
+    """Custom range dates as timestamps in the bars' timezone (end exclusive, as in yfinance)"""
+    return pd.Timestamp(start_date).tz_localize(tz), pd.Timestamp(end_date).tz_localize(tz)
+
+def _history_at(symbol, period, interval):
+    """Period history at ``interval``, synced at its base interval and resampled locally"""
+    window_start = _period_start(period)
+    base = _base_interval(interval, window_start)
+    _sync_history(symbol, base, window_start, period=period)
+    hist = _read_window(symbol, base, period, window_start)
+    if base != interval:
+        hist = resample_ohlcv(hist, interval)
+    return hist
+
+def _history_range(symbol, start_date, end_date, interval):
+    """Custom date range at ``interval``, sliced from stored history after fetching only its gaps"""
+    base = _base_interval(interval, pd.Timestamp(start_date, tz='UTC'))
+    coverage = store.get_coverage(symbol, base)
+    start, end = _custom_bounds(start_date, end_date, (coverage or {}).get('tz') or DEFAULT_TIMEZONE)
+    _sync_history(symbol, base, start, end=end)
+    coverage = store.get_coverage(symbol, base)
+    if coverage is None:
+        return store.read_history(symbol, base)
+    # The first fetch may have stored bars in a different exchange timezone
+    start, end = _custom_bounds(start_date, end_date, coverage['tz'] or 'UTC')
+    hist = slice_history(_stored_frame(symbol, base, coverage), start, end)
+    if base != interval:
+        hist = resample_ohlcv(hist, interval)
+    return hist
+
+def _new_corporate_action(delta, stored, last_bar):
+    """Whether re-fetched bars carry a dividend or split the store has not seen.
+
+    The delta starts at the last stored bar, which Yahoo may flag as an
+    ex-date only after we stored it, so that bar counts when its action is new.
+    """
+    if _has_corporate_action(delta[delta.index > last_bar]):
+        return True
+    refetched = delta[delta.index == last_bar]
+    return _has_corporate_action(refetched) and not _has_corporate_action(stored.loc[[last_bar]])
+
+def _has_corporate_action(hist):
+    """Check whether bars carry a dividend or split, which re-adjusts older prices"""
+    for column in ('Dividends', 'Stock Splits'):
+        if column in hist.columns and (hist[column].fillna(0) != 0).any():
+            return True
+    return False
+
+def _upstream(method, *args, **kwargs):
+    """Call the configured data provider through the rate limiter and circuit breaker"""
+    provider = providers.get_provider()
+    with telemetry.span(f"upstream.{method}"):
+        return ratelimit.call(getattr(provider, method), *args, shaped=provider.shaped, **kwargs)
+
+def get_quote(symbol):
+    """Latest ``{'price', 'volume', 'time'}`` quote for a symbol through the rate limiter, or None"""
+    try:
+        return _upstream('quote', symbol)
+    except Exception as e:
+        print(f"Quote unavailable for {symbol}: {e}")
+        return None
+
+def _stored_frame(symbol, interval, coverage=None):
+    """Everything stored for a symbol/interval, kept in memory until the store changes"""
+    coverage = coverage or store.get_coverage(symbol, interval)
+    if coverage is None:
+        return store.read_history(symbol, interval)
+    cached = _history_frames.get((symbol, interval))
+    if cached is not None and cached[0] == coverage['refreshed_at']:
+        return cached[1]
+    hist = store.read_history(symbol, interval)
+    _history_frames.put((symbol, interval), (coverage['refreshed_at'], hist))
+    return hist
+
+def slice_history(hist, start=None, end=None):
+    """Bars of a time-sorted history in ``[start, end)``, located by binary search"""
+    if hist.empty:
+        return hist
+    first = 0 if start is None else hist.index.searchsorted(start, side='left')
+    last = len(hist) if end is None else hist.index.searchsorted(end, side='left')
+    return hist.iloc[first:last]
+
+def plan_fetch(coverage, start, end=None, last_bar=None, now=None):
+    """Upstream fetches needed before the store can answer the window ``[start, end)``.
+
+    ``start`` None means all available history and ``end`` None means up to now.
+    Returns a list of gaps: 'full' when nothing is stored, 'head' when bars
+    older than the stored coverage are needed, and 'tail' when newer bars may
+    exist and the stored copy is older than STORE_REFRESH_SECONDS. An empty
+    list means the window can be sliced from the store as is.
+    """
+    if coverage is None:
+        return ['full']
+    gaps = []
+    if not store.covers(coverage, start):
+        gaps.append('head')
+    closed = end is not None and last_bar is not None and last_bar >= end
+    if not closed and (now or time.time()) - coverage['refreshed_at'] >= STORE_REFRESH_SECONDS:
+        gaps.append('tail')
+    return gaps
+
+def _window_kwargs(start, period=None):
+    """yfinance history() arguments for everything from ``start`` (None means 'max') up to now"""
+    if period is not None:
+        return {'period': period}
+    if start is None:
+        return {'period': 'max'}
+    return {'start': start.strftime('%Y-%m-%d')}
+
+def _sync_history(symbol, interval, window_start, end=None, period=None):
+    """Bring the store up to date for a window, fetching only the gaps plan_fetch finds.
+
+    ``period`` is passed to Yahoo for a cold fetch so its period semantics apply;
+    otherwise the window is fetched from ``window_start``.
+    """
+    coverage = store.get_coverage(symbol, interval)
+    stored = _stored_frame(symbol, interval, coverage)
+    last_bar = stored.index[-1] if not stored.empty else None
+    gaps = plan_fetch(coverage, window_start, end, last_bar)
+    if not gaps:
+        telemetry.increment('history_cache_total', result='hit')
+
+    for gap in gaps:
+        if gap == 'full' or (gap == 'tail' and last_bar is None):
+            # Cold, or covered but holding no bars: fetch the whole window once
+            telemetry.increment('history_cache_total', result='miss')
+            hist = _upstream('history', symbol, interval=interval, **_window_kwargs(window_start, period))
+            if not hist.empty:
+                store.write_history(symbol, interval, hist, covered_from=window_start)
+        elif gap == 'head':
+            # Only bars older than what we hold; overlap by a day so the ranges join up
+            telemetry.increment('history_cache_total', result='head')
+            kwargs = _window_kwargs(window_start)
+            if window_start is not None:
+                kwargs['end'] = (coverage['covered_from'] + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            hist = _upstream('history', symbol, interval=interval, **kwargs)
+            if not hist.empty:
+                store.write_history(symbol, interval, hist, covered_from=window_start)
+        else:
+            # Stale: re-fetch from the last stored bar so a partial bar gets completed
+            telemetry.increment('history_cache_total', result='delta')
+            delta = _upstream('history', symbol, start=last_bar.strftime('%Y-%m-%d'), interval=interval)
+            if delta.empty:
+                store.touch(symbol, interval)
+            elif _new_corporate_action(delta, stored, last_bar):
+                # Adjusted prices changed for the whole history, so rebuild everything we hold
+                held_from = store.get_coverage(symbol, interval)['covered_from']
+                rebuild_from = None if held_from is None or window_start is None else min(held_from, window_start)
+                hist = _upstream('history', symbol, interval=interval, **_window_kwargs(rebuild_from))
+                if hist.empty:
+                    # Never trade the stored bars for nothing; the next refresh sees the action again
+                    store.touch(symbol, interval)
+                else:
+                    store.write_history(symbol, interval, hist, covered_from=rebuild_from, replace=True)
+            else:
+                store.write_history(symbol, interval, delta)
+
+def _read_window(symbol, interval, period, window_start):
+    """Read a period window from the stored history"""
+    hist = slice_history(_stored_frame(symbol, interval), window_start)
+    match = _PERIOD_PATTERN.match(period)
+    if match and match.group(2) == 'd' and not hist.empty:
+        # Trim day periods to the requested number of sessions
+        sessions = hist.index.normalize().unique()
+        hist = hist[hist.index.normalize() >= sessions[-min(int(match.group(1)), len(sessions))]]
+    return hist
+
+def _error_code(error):
+    """Map an upstream error to one of our error codes"""
+    if ratelimit.is_rate_limit_error(error):
+        return "RATE_LIMITED"
+    return f"ERROR: {error}"
+
+def _download_group(symbols, interval, max_workers, **window):
+    """Download one group of symbols in a single grouped provider request"""
+    frames, status = {}, {}
+    try:
+        data, errors = _upstream(
+            'download', symbols, interval=interval, group_by='ticker', threads=max_workers,
+            actions=True, ignore_tz=False, progress=False, **window
+        )
+    except Exception as e:
+        print(f"Error downloading batch of {len(symbols)} symbols: {e}")
+        return frames, {symbol: _error_code(e) for symbol in symbols}
+
+    for symbol in symbols:
+        if data is not None and isinstance(data.columns, pd.MultiIndex) and symbol in data.columns.get_level_values(0):
+            frame = data[symbol].dropna(how='all')
+        else:
+            frame = pd.DataFrame()
+        if not frame.empty:
+            frames[symbol] = frame
+        elif symbol in errors:
+            status[symbol] = _error_code(errors[symbol])
+        else:
+            status[symbol] = "NO_DATA"
+    if "RATE_LIMITED" in status.values():
+        # Throttled per symbol inside an otherwise successful download
+        ratelimit.yahoo_breaker.trip()
+    return frames, status
+
+def get_stock_data_batch(symbols, period='1y', interval='1d', max_workers=8, chunk_size=50):
+    """Fetch history for many symbols with grouped requests, backed by the local OHLCV store.
+
+    Returns ``(frames, status)``: a dict of DataFrames keyed by symbol and a dict
+    of per-symbol status codes ("OK" or one of the get_stock_data error codes).
+    Like get_stock_data, bars are stored at the base interval and resampled to
+    ``interval`` on read.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    window_start = _period_start(period)
+    base = _base_interval(interval, window_start)
+    if base is None:
+        return {}, dict.fromkeys(symbols, f"ERROR: {interval} bars are not available for period {period}")
+    status = {}
+
+    # Plan: cold symbols need the whole window, stale ones only bars after their last stored bar
+    cold, stale = [], {}
+    for symbol in symbols:
+        coverage = store.get_coverage(symbol, base)
+        last = store.last_timestamp(symbol, base) if coverage is not None else None
+        if not store.covers(coverage, window_start) or last is None:
+            cold.append(symbol)
+        elif time.time() - coverage['refreshed_at'] >= STORE_REFRESH_SECONDS:
+            stale.setdefault(last.strftime('%Y-%m-%d'), []).append(symbol)
+
+    rebuild = []
+    for start, group in stale.items():
+        for i in range(0, len(group), chunk_size):
+            chunk = group[i:i + chunk_size]
+            frames, errors = _download_group(chunk, base, max_workers, start=start)
+            for symbol in chunk:
+                last = store.last_timestamp(symbol, base)
+                if symbol in frames:
+                    delta = frames[symbol]
+                    if _new_corporate_action(delta, _stored_frame(symbol, base), last):
+                        rebuild.append(symbol)
+                    else:
+                        store.write_history(symbol, base, delta)
+                elif errors.get(symbol) == "NO_DATA":
+                    store.touch(symbol, base)
+                else:
+                    # Keep serving what we have; the refresh is retried next time
+                    print(f"Refresh failed for {symbol}: {errors.get(symbol)}")
+
+    for group, replace in ((cold, False), (rebuild, True)):
+        for i in range(0, len(group), chunk_size):
+            chunk = group[i:i + chunk_size]
+            frames, errors = _download_group(chunk, base, max_workers, period=period)
+            if not replace:
+                # Symbols being rebuilt can still be served from their stored bars
+                status.update(errors)
+            for symbol, frame in frames.items():
+                store.write_history(symbol, base, frame, covered_from=window_start, replace=replace)
+
+    frames = {}
+    for symbol in symbols:
+        if symbol in status:
+            continue
+        hist = _read_window(symbol, base, period, window_start)
+        if base != interval:
+            hist = resample_ohlcv(hist, interval)
+        if hist.empty:
+            status[symbol] = "NO_DATA"
+        else:
+            frames[symbol] = hist
+            status[symbol] = "OK"
+    return frames, {symbol: status[symbol] for symbol in symbols}
+
+def _fetch_info(symbol):
+    """Fetch Ticker.info and cache it when complete"""
+    info, _ = _inflight.do(('info', symbol), lambda: _upstream('info', symbol))
+    if info and len(info) >= 5:
+        fetched_at = time.time()
+        with _info_lock:
+            _info_cache[symbol] = (info, fetched_at)
+        store.write_info(symbol, info, fetched_at)
+    return info
+
+def _refresh_info(symbol):
+    """Background refresh for stale-while-revalidate"""
+    try:
+        _fetch_info(symbol)
+    except Exception as e:
+        print(f"Background info refresh failed for {symbol}: {e}")
+    finally:
+        with _info_lock:
+            _info_refreshing.discard(symbol)
+
+def get_stock_info(symbol, ttl=None, stale_while_revalidate=True):
+    """Get fundamentals from the info cache, fetching Ticker.info only when needed.
+
+    Entries younger than ``ttl`` seconds are served as is. Older entries are
+    served immediately while a background thread refreshes them when
+    ``stale_while_revalidate`` is set, otherwise they are re-fetched inline.
+    """
+    ttl = INFO_TTL_SECONDS if ttl is None else ttl
+    with _info_lock:
+        cached = _info_cache.get(symbol)
+    if cached is None or time.time() - cached[1] >= ttl:
+        # Another process (e.g. the cache warmer) may have stored a fresher copy
+        stored = store.read_info(symbol)
+        if stored is not None and (cached is None or stored[1] > cached[1]):
+            cached = stored
+            with _info_lock:
+                _info_cache[symbol] = cached
+
+    if cached is not None:
+        info, fetched_at = cached
+        if time.time() - fetched_at < ttl:
+            telemetry.increment('info_cache_total', result='hit')
+            return info
+        if stale_while_revalidate:
+            telemetry.increment('info_cache_total', result='stale')
+            with _info_lock:
+                start = symbol not in _info_refreshing
+                _info_refreshing.add(symbol)
+            if start:
+                threading.Thread(target=_refresh_info, args=(symbol,), daemon=True).start()
+            return info
+
+    telemetry.increment('info_cache_total', result='miss')
+    return _fetch_info(symbol)
+
+def interval_supported(interval, period, start_date=None):
+    """Whether ``interval`` bars can be served for a period (or a custom range from ``start_date``)"""
+    return _base_interval(interval, _request_start(period, start_date)) is not None
+
+def get_stored_data(symbol, period='1y', start_date=None, end_date=None, interval='1d', max_age=None, partial=False):
+    """Stored history and cached info for a request without any upstream call, or None.
+
+    ``max_age`` (seconds) rejects data not refreshed that recently; ``partial``
+    also serves stored bars that only cover part of the requested window.
+    """
+    base = _base_interval(interval, _request_start(period, start_date))
+    coverage = store.get_coverage(symbol, base)
+    if coverage is None:
+        return None
+    if max_age is not None and time.time() - coverage['refreshed_at'] >= max_age:
+        return None
+    if period == 'custom':
+        start, end = _custom_bounds(start_date, end_date, coverage['tz'] or 'UTC')
+        if not partial and not store.covers(coverage, start):
+            return None
+        hist = slice_history(_stored_frame(symbol, base, coverage), start, end)
+    else:
+        window_start = _period_start(period)
+        if not partial and not store.covers(coverage, window_start):
+            return None
+        hist = _read_window(symbol, base, period, window_start)
+    if base != interval:
+        hist = resample_ohlcv(hist, interval)
+
+    cached = _info_cache.get(symbol) or store.read_info(symbol)
+    if hist.empty or cached is None:
+        return None
+    # Callers mutate the frame (calculate_metrics adds columns)
+    return hist.copy(), cached[0]
+
+def get_stock_data(symbol, period='1y', start_date=None, end_date=None, retry_count=3, interval='1d',
+                   store_fallback=True):
+    """Fetch stock data from the data provider with retry logic and the local OHLCV store.
+
+    Yahoo calls go through the process-wide rate limiter and circuit breaker, so a
+    rate limit fails fast to stored data (or RATE_LIMITED) instead of sleeping;
+    with ``store_fallback`` off it always returns RATE_LIMITED, for callers that
+    serve and label stored data themselves. Concurrent requests for the same symbol and window share a single fetch.
+    ``interval`` bars are resampled locally from the finest stored base interval
+    that Yahoo serves for the whole period. Periods and custom ranges inside the
+    stored history are sliced from it; only the missing gaps are fetched.
+    """
+    if not interval_supported(interval, period, start_date):
+        return None, f"ERROR: {interval} bars are not available for period {period}"
+
+    try:
+        store.record_access(symbol)
+    except Exception as e:
+        print(f"Could not record access for {symbol}: {e}")
+
+    key = ('history', symbol, period, start_date, end_date, interval, store_fallback)
+    with telemetry.span('get_stock_data', symbol=symbol, period=period, interval=interval) as fields:
+        (hist, info), fields['coalesced'] = _inflight.do(
+            key, lambda: _get_stock_data(symbol, period, start_date, end_date, retry_count, interval, store_fallback)
+        )
+        fields['result'] = "OK" if hist is not None else info
+    if hist is not None:
+        # The frame may be shared and callers mutate it (calculate_metrics adds columns)
+        hist = hist.copy()
+    return hist, info
+
+def _get_stock_data(symbol, period, start_date, end_date, retry_count, interval='1d', store_fallback=True):
+    """Uncoalesced body of get_stock_data"""
+    with telemetry.span('load_history', symbol=symbol) as fields:
+        hist, info = _load_with_retries(symbol, period, start_date, end_date, retry_count, fields, interval,
+                                        store_fallback)
+    return hist, info
+
+def _load_with_retries(symbol, period, start_date, end_date, retry_count, fields, interval='1d',
+                       store_fallback=True):
+    """Fetch history and info, recording attempts and fallbacks in the span ``fields``"""
     for attempt in range(retry_count):
+        fields['attempts'] = attempt + 1
+        if attempt:
+            telemetry.increment('history_retries_total')
         try:
-            stock = yf.Ticker(symbol)
-            
-            # Add small delay between requests to avoid rate limiting
-            if attempt > 0:
-                time.sleep(2 * attempt)
-            
             if period == 'custom' and start_date and end_date:
-                hist = stock.history(start=start_date, end=end_date)
+                hist = _history_range(symbol, start_date, end_date, interval)
             else:
-                hist = stock.history(period=period)
+                hist = _history_at(symbol, period, interval)
             
             # Handle cases where data might be empty
             if hist.empty:
@@ -146,7 +650,7 @@ def get_stock_data(symbol, period='1y', start_date=None, end_date=None, retry_co
                     continue
                 return None, "NO_DATA"
                 
-            info = stock.info
+            info = get_stock_info(symbol)
             # Check if info is properly loaded
             if not info or len(info) < 5:
                 print(f"Incomplete stock info for {symbol} on attempt {attempt + 1}")
@@ -158,16 +662,19 @@ def get_stock_data(symbol, period='1y', start_date=None, end_date=None, retry_co
             
         except Exception as e:
             error_msg = str(e)
-            if "Rate limited" in error_msg or "Too Many Requests" in error_msg:
-                print(f"Rate limit reached for {symbol} on attempt {attempt + 1}. Waiting before retry...")
-                if attempt < retry_count - 1:
-                    time.sleep(5 * (attempt + 1))  # Increase wait time with each retry
-                    continue
+            if ratelimit.is_rate_limit_error(e):
+                # Retrying only adds load while throttled; serve what we already hold
+                print(f"Rate limited fetching {symbol}: {error_msg}")
+                telemetry.increment('rate_limited_total')
+                fallback = get_stored_data(symbol, period, start_date, end_date, interval) if store_fallback else None
+                if fallback is not None:
+                    print(f"Serving stored data for {symbol}")
+                    fields['fallback'] = 'store'
+                    return fallback
                 return None, "RATE_LIMITED"
             else:
                 print(f"Error fetching stock data for {symbol}: {error_msg}")
                 if attempt < retry_count - 1:
-                    time.sleep(1)
                     continue
                 return None, f"ERROR: {error_msg}"
     
@@ -175,8 +682,9 @@ def get_stock_data(symbol, period='1y', start_date=None, end_date=None, retry_co
 
 def calculate_metrics(df):
     """Calculate technical indicators"""
-    # Basic moving averages
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
+    # Basic moving averages; the 20-bar window also gives the Bollinger Bands
+    rolling_20 = df['Close'].rolling(window=20)
+    df['SMA_20'] = rolling_20.mean()
     df['SMA_50'] = df['Close'].rolling(window=50).mean()
 
     # RSI
@@ -189,9 +697,10 @@ def calculate_metrics(df):
     df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
 
     # Bollinger Bands
-    df['BB_middle'] = df['Close'].rolling(window=20).mean()
-    df['BB_upper'] = df['BB_middle'] + 2 * df['Close'].rolling(window=20).std()
-    df['BB_lower'] = df['BB_middle'] - 2 * df['Close'].rolling(window=20).std()
+    band = 2 * rolling_20.std()
+    df['BB_middle'] = df['SMA_20']
+    df['BB_upper'] = df['BB_middle'] + band
+    df['BB_lower'] = df['BB_middle'] - band
 
     return df
 
@@ -203,17 +712,76 @@ def calculate_rsi(prices, period=14):
     rs = gain / loss
     return 100 - (100 / (1 + rs))
 
-def create_price_chart(df, symbol, period='1y'):
-    """Create an interactive price chart with indicators"""
-    # Determine date range for time formatting
-    if len(df) <= 5:
-        # For 5 days or less, show hourly timestamps
-        date_format = "%H:%M"
+def downsample_lttb(x, y, threshold):
+    """Pick indices of ``threshold`` points preserving the visual shape (Largest-Triangle-Three-Buckets)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket boundaries for the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third vertex of the triangle
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def _bar_size(index):
+    """Typical spacing between bars (one day when there are too few to tell)"""
+    if len(index) < 2:
+        return pd.Timedelta(days=1)
+    return pd.Series(index[1:] - index[:-1]).median()
+
+def _chart_series(df, column, max_points):
+    """x/y trace data for one column, downsampled to ``max_points`` when set"""
+    series = df[column].dropna()
+    if max_points is None or len(series) <= max_points:
+        return dict(x=series.index, y=series.values)
+    keep = downsample_lttb(series.index.asi8, series.values, max_points)
+    return dict(x=series.index[keep], y=series.values[keep])
+
+# Point budget per chart trace, and history length above which traces use WebGL
+CHART_MAX_POINTS = 1500
+CHART_WEBGL_THRESHOLD = 2000
+
+def create_price_chart(df, symbol, period='1y', max_points=CHART_MAX_POINTS, webgl_threshold=CHART_WEBGL_THRESHOLD):
+    """Create an interactive price chart with indicators.
+
+    Traces longer than ``max_points`` are downsampled with LTTB (pass None to plot
+    every point), and histories longer than ``webgl_threshold`` bars are drawn
+    with WebGL traces.
+    """
+    # plotly is only imported once a chart is needed
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    scatter = go.Scattergl if len(df) > webgl_threshold else go.Scatter
+
+    # Label the chart by its bar size rather than its bar count
+    bar_size = _bar_size(df.index)
+    intraday = bar_size < pd.Timedelta(days=1)
+    if bar_size < pd.Timedelta(hours=1):
+        title_suffix = f" ({bar_size.seconds // 60}-Minute)"
+    elif intraday:
         title_suffix = " (Hourly)"
-    else:
-        # For more than 5 days, show dates
-        date_format = "%Y-%m-%d"
+    elif bar_size < pd.Timedelta(days=5):
         title_suffix = " (Daily)"
+    else:
+        title_suffix = " (Weekly)"
     
     # Create figure with secondary y-axis
     fig = make_subplots(
@@ -226,9 +794,8 @@ def create_price_chart(df, symbol, period='1y'):
 
     # Main price line chart
     fig.add_trace(
-        go.Scatter(
-            x=df.index,
-            y=df['Close'],
+        scatter(
+            **_chart_series(df, 'Close', max_points),
             mode='lines',
             name='Close Price',
             line=dict(color='#00FF9D', width=2),
@@ -239,9 +806,8 @@ def create_price_chart(df, symbol, period='1y'):
 
     # Bollinger Bands with reduced opacity
     fig.add_trace(
-        go.Scatter(
-            x=df.index,
-            y=df['BB_upper'],
+        scatter(
+            **_chart_series(df, 'BB_upper', max_points),
             name='Upper Band',
             line=dict(color='rgba(173, 204, 255, 0.3)'),
             showlegend=True
@@ -250,9 +816,8 @@ def create_price_chart(df, symbol, period='1y'):
     )
 
     fig.add_trace(
-        go.Scatter(
-            x=df.index,
-            y=df['BB_lower'],
+        scatter(
+            **_chart_series(df, 'BB_lower', max_points),
             name='Lower Band',
             line=dict(color='rgba(173, 204, 255, 0.3)'),
             fill='tonexty',
@@ -266,9 +831,8 @@ def create_price_chart(df, symbol, period='1y'):
 
     # Volume area chart
     fig.add_trace(
-        go.Scatter(
-            x=df.index,
-            y=df['Volume'],
+        scatter(
+            **_chart_series(df, 'Volume', max_points),
             mode='lines',
             fill='tozeroy',
             name='Volume',
@@ -281,9 +845,8 @@ def create_price_chart(df, symbol, period='1y'):
 
     # RSI with improved visualization
     fig.add_trace(
-        go.Scatter(
-            x=df.index,
-            y=df['RSI'],
+        scatter(
+            **_chart_series(df, 'RSI', max_points),
             name='RSI',
             line=dict(color='#00FF9D', width=1.5),
             showlegend=True
@@ -332,15 +895,21 @@ def create_price_chart(df, symbol, period='1y'):
     )
 
     # Add grid and improve axes with dynamic formatting
-    if len(df) <= 5:
-        # For 5 days or less, format x-axis for hourly display
+    if intraday:
+        # Intraday bars: show times and hide the overnight and weekend gaps
+        times = df.index.hour + df.index.minute / 60
+        session_close = times.max() + bar_size.seconds / 3600
+        one_session = df.index[0].normalize() == df.index[-1].normalize()
         fig.update_xaxes(
             showgrid=True,
             gridwidth=1,
             gridcolor='rgba(128,128,128,0.2)',
             zeroline=False,
-            tickformat="%H:%M",
-            dtick="H1"  # Show every hour
+            tickformat="%H:%M" if one_session else "%d %b %H:%M",
+            rangebreaks=[
+                dict(bounds=['sat', 'mon']),
+                dict(bounds=[session_close, times.min()], pattern='hour'),
+            ]
         )
     else:
         # For more than 5 days, format x-axis for daily display
@@ -366,6 +935,131 @@ def create_price_chart(df, symbol, period='1y'):
 
     return fig
 
+# create_price_chart traces and the analysis frame columns they plot
+CHART_TRACE_COLUMNS = {
+    'Close Price': 'Close',
+    'Upper Band': 'BB_upper',
+    'Lower Band': 'BB_lower',
+    'Volume': 'Volume',
+    'RSI': 'RSI',
+}
+
+# Share of the point budget a live-patched trace may grow by before it is downsampled again
+CHART_PATCH_SLACK = 0.1
+
+def patch_price_chart(fig, df, bar_time, max_points=CHART_MAX_POINTS):
+    """Update a create_price_chart figure in place for the last bar of ``df``.
+
+    Only the point at ``bar_time`` changes: it replaces each trace's last point
+    when that is the same bar, or is appended after it for a new bar. The rest
+    of the (possibly downsampled) traces is left as built, until new bars push a
+    trace more than CHART_PATCH_SLACK past ``max_points`` and it is downsampled
+    back to ``max_points`` with LTTB.
+    """
+    with fig.batch_update():
+        for trace in fig.data:
+            column = CHART_TRACE_COLUMNS.get(trace.name)
+            if column is None or pd.isna(df[column].iloc[-1]):
+                continue
+            value = df[column].iloc[-1]
+            x, y = list(trace.x), list(trace.y)
+            if x and pd.Timestamp(x[-1]) == bar_time:
+                y[-1] = value
+            else:
+                x.append(bar_time)
+                y.append(value)
+                if max_points is not None and len(x) > max_points * (1 + CHART_PATCH_SLACK):
+                    # Keep the redrawn payload bounded however long the session runs
+                    keep = downsample_lttb(pd.DatetimeIndex(x).asi8, y, max_points)
+                    x, y = [x[i] for i in keep], [y[i] for i in keep]
+            trace.x, trace.y = x, y
+    return fig
+
+def create_correlation_heatmap(matrix, title='Return Correlation'):
+    """Heatmap of a symbol x symbol correlation matrix on a fixed -1..1 scale"""
+    import plotly.graph_objects as go
+
+    labels = [symbol.replace('.NS', '') for symbol in matrix.columns]
+    fig = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=labels,
+        y=labels,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        reversescale=True,
+        hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=title,
+        height=max(500, min(1200, 14 * len(labels))),
+        template='plotly_dark',
+        yaxis=dict(autorange='reversed'),
+        margin=dict(l=50, r=50, t=50, b=50)
+    )
+    return fig
+
+def normalized_performance(close):
+    """Percent change of each column of a close panel since the first date every symbol has a close"""
+    complete = close.dropna()
+    start = complete.index[0] if len(complete) else close.index[0]
+    close = close.loc[start:]
+    return (close / close.iloc[0] - 1) * 100
+
+def create_comparison_chart(close, rsi=None, max_points=CHART_MAX_POINTS, webgl_threshold=CHART_WEBGL_THRESHOLD):
+    """Overlay the normalized performance (and optionally RSI) of every column of a close panel.
+
+    Each symbol gets one color and legend entry shared by its traces, so
+    clicking it hides the symbol in both rows. Traces are downsampled to
+    ``max_points`` each, and charts with more than ``webgl_threshold`` points in
+    total are drawn with WebGL traces.
+    """
+    import plotly.graph_objects as go
+    import plotly.express as px
+    from plotly.subplots import make_subplots
+
+    performance = normalized_performance(close)
+    rows = 2 if rsi is not None else 1
+    fig = make_subplots(
+        rows=rows, cols=1, shared_xaxes=True, vertical_spacing=0.05,
+        row_heights=[0.7, 0.3] if rows == 2 else [1.0]
+    )
+    scatter = go.Scattergl if performance.size > webgl_threshold else go.Scatter
+    colors = px.colors.qualitative.Dark24
+
+    for i, symbol in enumerate(performance.columns):
+        name = symbol.replace('.NS', '')
+        color = colors[i % len(colors)]
+        fig.add_trace(scatter(
+            **_chart_series(performance, symbol, max_points), name=name, legendgroup=symbol,
+            line=dict(color=color, width=1.5), hovertemplate=f'{name}: %{{y:.2f}}%<extra></extra>'
+        ), row=1, col=1)
+        if rsi is not None:
+            fig.add_trace(scatter(
+                **_chart_series(rsi.loc[performance.index[0]:], symbol, max_points), name=name,
+                legendgroup=symbol, showlegend=False, line=dict(color=color, width=1),
+                hovertemplate=f'{name} RSI: %{{y:.1f}}<extra></extra>'
+            ), row=2, col=1)
+
+    if rsi is not None:
+        fig.add_hline(y=70, line_dash="dash", line_color="red", opacity=0.5, row=2, col=1)
+        fig.add_hline(y=30, line_dash="dash", line_color="green", opacity=0.5, row=2, col=1)
+        fig.update_yaxes(title_text="RSI", range=[0, 100], row=2, col=1, title_standoff=10)
+
+    fig.add_hline(y=0, line_color="gray", opacity=0.5, row=1, col=1)
+    fig.update_layout(
+        title='Performance Comparison',
+        height=800 if rows == 2 else 550,
+        template='plotly_dark',
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='left', x=0),
+        margin=dict(l=50, r=50, t=80, b=50)
+    )
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)', zeroline=False)
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)', zeroline=False)
+    fig.update_yaxes(title_text="Change (%)", ticksuffix='%', row=1, col=1, title_standoff=10)
+    return fig
+
 def format_number(number):
     """Format large numbers with K, M, B suffixes"""
     try:
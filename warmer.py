@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Background cache warmer for the stock universe
+Pre-fetches history and fundamentals on startup and after each NSE session close.
+Run standalone with: python warmer.py [--once] [--symbols-file FILE]
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import ratelimit
+import store
+from utils import DEFAULT_STOCKS, INFO_TTL_SECONDS, get_stock_data_batch, get_stock_info
+
+# History window to keep warm; it covers every shorter predefined period
+WARM_PERIOD = '5y'
+# Symbols per grouped history request
+WARM_CHUNK_SIZE = 25
+# Pause between fundamentals requests, leaving rate budget for interactive users
+WARM_INFO_INTERVAL_SECONDS = 1.0
+
+# NSE closes at 15:30 IST; warm a little later so the final bars are published
+NSE_TIMEZONE = ZoneInfo('Asia/Kolkata')
+WARM_AFTER_CLOSE = (15, 45)
+
+def order_by_hotness(symbols):
+    """Sort symbols by recent access frequency, hottest first (ties keep their order)"""
+    scores = store.access_scores()
+    return sorted(symbols, key=lambda symbol: -scores.get(symbol, 0.0))
+
+def warm_universe(symbols=None, period=WARM_PERIOD):
+    """Warm history and fundamentals for a universe, hottest symbols first.
+
+    Returns the per-symbol status map. Stops early, leaving the rest for the
+    next run, while Yahoo is rate limiting us.
+    """
+    symbols = order_by_hotness(symbols or DEFAULT_STOCKS)
+    status = {}
+    print(f"🔥 Warming {len(symbols)} stocks...")
+
+    for i in range(0, len(symbols), WARM_CHUNK_SIZE):
+        if ratelimit.yahoo_breaker.is_open:
+            print("Rate limited, postponing the rest of the warm-up")
+            return status
+        chunk = symbols[i:i + WARM_CHUNK_SIZE]
+        _, chunk_status = get_stock_data_batch(chunk, period, chunk_size=WARM_CHUNK_SIZE)
+        status.update(chunk_status)
+
+        for symbol in chunk:
+            cached = store.read_info(symbol)
+            if status[symbol] != "OK" or (cached and time.time() - cached[1] < INFO_TTL_SECONDS):
+                continue
+            try:
+                # Inline (not stale-while-revalidate) so the refreshed entry is stored before we move on
+                get_stock_info(symbol, stale_while_revalidate=False)
+            except Exception as e:
+                print(f"Could not warm info for {symbol}: {e}")
+                if ratelimit.is_rate_limit_error(e):
+                    return status
+            time.sleep(WARM_INFO_INTERVAL_SECONDS)
+
+    warmed = sum(1 for code in status.values() if code == "OK")
+    print(f"✅ Warmed {warmed} of {len(symbols)} stocks")
+    return status
+
+def next_warm_time(now=None):
+    """Next NSE session close (plus a margin) after ``now``, skipping weekends"""
+    now = now or datetime.now(NSE_TIMEZONE)
+    candidate = now.replace(hour=WARM_AFTER_CLOSE[0], minute=WARM_AFTER_CLOSE[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+def run_scheduler(symbols=None, stop_event=None):
+    """Warm on startup, then after every NSE session close until ``stop_event`` is set"""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            warm_universe(symbols)
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+        wake_at = next_warm_time()
+        print(f"Next warm-up at {wake_at:%Y-%m-%d %H:%M} IST")
+        stop_event.wait((wake_at - datetime.now(NSE_TIMEZONE)).total_seconds())
+
+def start_background_warmer(symbols=None):
+    """Start the warm-up scheduler in a daemon thread; returns its stop event"""
+    stop_event = threading.Event()
+    threading.Thread(target=run_scheduler, args=(symbols, stop_event), daemon=True, name='cache-warmer').start()
+    return stop_event
+
+def main():
+    """Standalone warmer worker"""
+    parser = argparse.ArgumentParser(description="Pre-warm the stock data cache")
+    parser.add_argument('--once', action='store_true', help="Warm once and exit instead of scheduling")
+    parser.add_argument('--symbols-file', help="Universe file (defaults to the built-in stock list)")
+    args = parser.parse_args()
+
+    symbols = None
+    if args.symbols_file:
+        from screener import load_universe
+        symbols = load_universe(args.symbols_file)
+
+    if args.once:
+        warm_universe(symbols)
+    else:
+        try:
+            run_scheduler(symbols)
+        except KeyboardInterrupt:
+            print("\n👋 Warmer stopped by user")
+
+if __name__ == "__main__":
+    main()